@@ -1,5 +1,11 @@
+import pandas as pd
 import streamlit as st
 
+# Copy-on-Write per tutto il processo: le viste derivate dai dataset condivisi
+# (iloc, selezione colonne, set_index...) non copiano i dati e non possono
+# modificarli. Da pandas 3 è sempre attivo; prima va abilitato qui, una volta.
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
 
 
 st.set_page_config(
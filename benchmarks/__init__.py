@@ -0,0 +1 @@
+# Suite di benchmark della pipeline della dashboard.
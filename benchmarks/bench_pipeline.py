@@ -0,0 +1,168 @@
+# ==============================================================================
+# BENCHMARK DELLA PIPELINE DELLE PAGINE
+# ==============================================================================
+# Misura tempo e picco di memoria di ogni fase eseguita dalle pagine su
+# dataset sintetici di dimensione crescente e salva un report JSON
+# confrontabile tra versioni.
+# Uso: python -m benchmarks.bench_pipeline --righe 10000 100000 1000000
+import argparse
+import io
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic import genera_dataset
+from core.ingestion import carica_csv
+from core.aggregates import costruisci_cubo
+from core.correlations import OPZIONI_ANALISI, calcola_statistiche_correlazione
+from core.forecast import predici_batch
+from core.rendering import statistiche_box
+from core.store import compatta_dtypes
+from core.timeindex import SerieIndicizzata, indicizza_per_data
+from core.weather import COLONNE_METEO, ETICHETTE_METEO, tabella_impatto_meteo
+
+FEATURE_MODELLO = ['hr', 'season', 'workingday', 'temp', 'hum', 'windspeed', *COLONNE_METEO]
+# Predizioni a riga singola misurate (il costo per riga è costante)
+N_PREDIZIONI_SINGOLE = 200
+
+DIR_RISULTATI = Path(__file__).parent / "risultati"
+
+
+def misura(funzione, ripetizioni: int = 3) -> dict:
+    """Miglior tempo su `ripetizioni` esecuzioni e picco di memoria allocata."""
+    tempi = []
+    for _ in range(ripetizioni):
+        inizio = time.perf_counter()
+        funzione()
+        tempi.append(time.perf_counter() - inizio)
+
+    tracemalloc.start()
+    funzione()
+    _, picco = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'secondi': min(tempi), 'picco_mb': picco / 1024 ** 2}
+
+
+def _versione_codice() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def fasi(df: pd.DataFrame, csv: bytes, cartella_cache: Path) -> dict:
+    """Fasi da misurare: nome -> funzione senza argomenti."""
+    df_idx = indicizza_per_data(df)
+
+    # Modello lineare minimale per le fasi di predizione
+    try:
+        from sklearn.linear_model import LinearRegression
+        campione = df.sample(min(len(df), 10_000), random_state=0)
+        modello = LinearRegression().fit(campione[FEATURE_MODELLO], campione['cnt'])
+    except ImportError:
+        modello = None
+
+    def csv_load():
+        d = pd.read_csv(io.BytesIO(csv))
+        d[d.columns[0]] = pd.to_datetime(d[d.columns[0]])
+
+    def csv_snapshot():
+        carica_csv(csv, cartella_cache)
+
+    def daily_groupby():
+        # Implementazione originale della pagina (gruppi su datetime.date)
+        d = df_idx.groupby(df_idx.index.date)[['registered', 'cnt']].sum()
+        d.index = pd.to_datetime(d.index)
+
+    def weather_idxmax():
+        # Implementazione originale (idxmax riga per riga + etichette stringa)
+        label = df_idx[COLONNE_METEO].idxmax(axis=1).map(ETICHETTE_METEO)
+        df_idx['cnt'].groupby([df_idx.index.year, label]).mean()
+
+    def correlation_groupby():
+        for var in OPZIONI_ANALISI:
+            df_idx.groupby(var)['cnt'].mean()
+
+    def box_stats():
+        statistiche_box(df_idx, 'hr', 'cnt')
+
+    risultato = {
+        'csv_load': csv_load,
+        'csv_snapshot': csv_snapshot,
+        'dtype_compaction': lambda: compatta_dtypes(df),
+        'index_setup': lambda: SerieIndicizzata(df, df.columns[0]),
+        'daily_groupby': daily_groupby,
+        'aggregate_cube': lambda: costruisci_cubo(df_idx),
+        'weather_idxmax': weather_idxmax,
+        'weather_engine': lambda: tabella_impatto_meteo(df_idx),
+        'correlation_groupby': correlation_groupby,
+        'box_stats': box_stats,
+        'correlation_engine': lambda: calcola_statistiche_correlazione(df_idx),
+    }
+    if modello is not None:
+        X = df[FEATURE_MODELLO]
+
+        def predict_single():
+            for i in range(min(N_PREDIZIONI_SINGOLE, len(X))):
+                modello.predict(X.iloc[[i]])
+
+        risultato['predict_single'] = predict_single
+        risultato['predict_batch'] = lambda: predici_batch(modello, X)
+    return risultato
+
+
+def esegui(righe: list[int], ripetizioni: int) -> dict:
+    risultati = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in righe:
+            df = genera_dataset(n)
+            csv = df.to_csv(index=False).encode()
+            # Warm-up dello snapshot: la misura riguarda i ricaricamenti
+            carica_csv(csv, Path(tmp))
+
+            for nome, funzione in fasi(df, csv, Path(tmp)).items():
+                m = misura(funzione, ripetizioni)
+                if nome == 'predict_single':
+                    m['righe_misurate'] = min(N_PREDIZIONI_SINGOLE, n)
+                risultati.append({'fase': nome, 'righe': n, **m})
+                print(f"{nome:<22} {n:>12,} righe  {m['secondi'] * 1000:>10.1f} ms  "
+                      f"{m['picco_mb']:>9.1f} MB", flush=True)
+
+    return {
+        'creato': datetime.now(timezone.utc).isoformat(),
+        'versione': _versione_codice(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'ripetizioni': ripetizioni,
+        'risultati': risultati,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark delle fasi della dashboard.")
+    parser.add_argument("--righe", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--ripetizioni", type=int, default=3)
+    parser.add_argument("--output", type=Path, default=None,
+                        help="File JSON del report (default: benchmarks/risultati/<timestamp>.json)")
+    args = parser.parse_args()
+
+    report = esegui(args.righe, args.ripetizioni)
+    output = args.output or DIR_RISULTATI / f"bench_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Report salvato in {output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
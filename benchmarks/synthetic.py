@@ -0,0 +1,85 @@
+# ==============================================================================
+# GENERATORE DI DATASET SINTETICI (stesso schema usato dalle pagine)
+# ==============================================================================
+# Serie oraria con prima colonna timestamp, volumi cnt/registered/casual,
+# One-Hot meteo 'weathersit_1.0..4.0' e variabili di calendario/clima.
+# Con --stazioni N ogni ora ha N righe, una per stazione ('station_id').
+# Uso: python -m benchmarks.synthetic --righe 1000000 --output dati.csv
+import argparse
+
+import numpy as np
+import pandas as pd
+
+# Probabilità delle condizioni meteo (Sole, Nuvoloso, Pioggia, Tempesta)
+PROB_METEO = [0.65, 0.26, 0.08, 0.01]
+# Effetto moltiplicativo del meteo sulla domanda
+EFFETTO_METEO = np.array([1.0, 0.9, 0.6, 0.3])
+# Oltre ~20 anni di ore i timestamp si ripetono (più stazioni per ora),
+# così anche 10M+ righe restano in un intervallo di date realistico
+MAX_ORE = 20 * 365 * 24
+
+
+def genera_dataset(n_righe: int, inizio: str = "2011-01-01", seed: int = 0, stazioni: int = 1) -> pd.DataFrame:
+    """Dataset orario sintetico di `n_righe` righe a partire da `inizio`.
+
+    Con `stazioni` > 1 aggiunge la colonna 'station_id' e una scala di
+    domanda diversa per stazione (dati panel).
+    """
+    rng = np.random.default_rng(seed)
+    righe_per_ora = max(stazioni, -(-n_righe // MAX_ORE))
+    ore_totali = -(-n_righe // righe_per_ora)
+    tempi = pd.date_range(inizio, periods=ore_totali, freq="h").repeat(righe_per_ora)[:n_righe]
+    ore = tempi.hour.to_numpy()
+    mesi = tempi.month.to_numpy()
+    workingday = (tempi.dayofweek < 5).astype(np.int64)
+
+    # Stagioni 1..4 (inverno, primavera, estate, autunno)
+    season = (mesi % 12) // 3 + 1
+    temp = np.clip(0.5 - 0.3 * np.cos(2 * np.pi * (tempi.dayofyear.to_numpy() - 15) / 365)
+                   + rng.normal(0, 0.05, n_righe), 0, 1)
+    hum = np.clip(rng.normal(0.6, 0.15, n_righe), 0, 1)
+    windspeed = np.clip(rng.gamma(2.0, 0.1, n_righe), 0, 1)
+    meteo = rng.choice(4, size=n_righe, p=PROB_METEO)
+
+    # Domanda: picchi pendolari nei feriali, picco pomeridiano nei festivi
+    picchi_feriali = np.exp(-((ore - 8) ** 2) / 4) + np.exp(-((ore - 18) ** 2) / 4)
+    picco_festivo = np.exp(-((ore - 14) ** 2) / 12)
+    base = np.where(workingday == 1, 400 * picchi_feriali, 300 * picco_festivo) + 20
+    base = base * (0.5 + temp) * EFFETTO_METEO[meteo]
+    if stazioni > 1:
+        id_stazioni = np.tile(np.arange(stazioni), ore_totali)[:n_righe]
+        base = base * rng.lognormal(0, 0.5, stazioni)[id_stazioni]
+
+    registered = rng.poisson(base * np.where(workingday == 1, 0.85, 0.6))
+    casual = rng.poisson(base * np.where(workingday == 1, 0.15, 0.4))
+
+    df = pd.DataFrame({
+        'datetime': tempi,
+        **({'station_id': id_stazioni} if stazioni > 1 else {}),
+        'season': season,
+        'hr': ore,
+        'workingday': workingday,
+        'temp': temp,
+        'hum': hum,
+        'windspeed': windspeed,
+        'casual': casual,
+        'registered': registered,
+        'cnt': casual + registered,
+    })
+    for i in range(4):
+        df[f'weathersit_{i + 1}.0'] = (meteo == i).astype(np.int64)
+    return df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Genera un CSV orario sintetico per i benchmark.")
+    parser.add_argument("--righe", type=int, default=100_000)
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stazioni", type=int, default=1, help="Serie (stazioni) per ora")
+    args = parser.parse_args()
+    genera_dataset(args.righe, seed=args.seed, stazioni=args.stazioni).to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+# Moduli di supporto condivisi dalle pagine della dashboard.
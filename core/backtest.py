@@ -0,0 +1,173 @@
+# ==============================================================================
+# BACKTESTING WALK-FORWARD PARALLELO
+# ==============================================================================
+# I modelli vengono valutati su finestre temporali consecutive. Ogni coppia
+# (modello, finestra) è un task per un pool di processi: i worker ricevono
+# i dati una sola volta all'avvio e caricano i modelli dal registro
+# (memory-mapped). Le metriche sono poi calcolate in modo vettoriale sugli
+# array di errori, complessive, per finestra, per ora, giorno e meteo.
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from core.features import calcola_matrice, frame_feature
+from core.forecast import previsioni_serie
+from core.lags import profondita_lag
+from core.models import carica_modello
+from core.weather import COLONNE_METEO, ETICHETTE_METEO, codici_meteo
+
+NOMI_GIORNI = ['Lun', 'Mar', 'Mer', 'Gio', 'Ven', 'Sab', 'Dom']
+
+# Dati condivisi dal worker (impostati dall'initializer del pool)
+_DATI = None
+
+
+def _inizializza_worker(dati: pd.DataFrame) -> None:
+    global _DATI
+    _DATI = dati
+
+
+@lru_cache(maxsize=8)
+def _modello(chiave: str):
+    return carica_modello(chiave)[0]
+
+
+def _prevedi_finestra(chiave: str, features: tuple, i: int, j: int):
+    # Le righe senza tutte le feature (lag su ore mancanti) restano NaN
+    matrice = _DATI.iloc[i:j][list(features)].to_numpy(dtype=float)
+    return chiave, i, j, previsioni_serie(_modello(chiave), matrice, features)
+
+
+def finestre_walk_forward(tempi: pd.DatetimeIndex, inizio, fine, giorni_finestra: int, giorni_passo: int):
+    """Finestre (i, j, start) consecutive di `giorni_finestra` giorni, avanzando di `giorni_passo`."""
+    finestre = []
+    start = pd.Timestamp(inizio)
+    fine = pd.Timestamp(fine)
+    durata = pd.Timedelta(days=giorni_finestra)
+    passo = pd.Timedelta(days=giorni_passo)
+    while start < fine:
+        end = min(start + durata, fine)
+        i = int(tempi.searchsorted(start, side='left'))
+        j = int(tempi.searchsorted(end, side='left'))
+        if j > i:
+            finestre.append((i, j, start))
+        start += passo
+    return finestre
+
+
+def metriche(y_true, y_pred) -> dict:
+    """MAE, RMSE, MAPE (%) e Bias (previsto - reale) su due array.
+
+    Le righe senza previsione (NaN) sono escluse, come nelle metriche per gruppo.
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    errore = np.asarray(y_pred, dtype=float) - y_true
+    valide = ~np.isnan(errore)
+    y_true, errore = y_true[valide], errore[valide]
+    non_zero = y_true != 0
+    return {
+        'MAE': np.abs(errore).mean() if len(errore) else np.nan,
+        'RMSE': np.sqrt((errore ** 2).mean()) if len(errore) else np.nan,
+        'MAPE': (np.abs(errore[non_zero]) / np.abs(y_true[non_zero])).mean() * 100 if non_zero.any() else np.nan,
+        'Bias': errore.mean() if len(errore) else np.nan,
+        'n': len(errore),
+    }
+
+
+def _metriche_per_gruppo(errori: pd.DataFrame, chiavi: list) -> pd.DataFrame:
+    gruppi = errori.groupby(chiavi, sort=True)
+    out = pd.DataFrame({
+        'MAE': gruppi['abs'].mean(),
+        'RMSE': np.sqrt(gruppi['sq'].mean()),
+        'MAPE': gruppi['ape'].mean() * 100,
+        'Bias': gruppi['err'].mean(),
+        'n': gruppi['err'].count(),
+    })
+    return out
+
+
+def esegui_backtest(df: pd.DataFrame, tempi: pd.DatetimeIndex, modelli: dict, finestre: list,
+                    col_target: str = 'cnt', max_workers: int | None = None) -> dict:
+    """Valuta ogni modello su ogni finestra.
+
+    `modelli` è un dizionario nome -> (chiave registro, feature del modello).
+    Restituisce un dizionario di DataFrame: 'riepilogo', 'per_finestra',
+    'per_ora', 'per_giorno', 'per_meteo'.
+    """
+    if not finestre or not modelli:
+        return {}
+
+    # Ai worker inviamo solo le righe e le colonne che servono, una volta sola.
+    # Le feature mancanti nel CSV (one-hot, calendario, lag di cnt) vengono
+    # costruite solo sulle finestre più lo storico richiesto dai lag, così i
+    # lag vedono anche le ore prima della finestra
+    i_min = min(f[0] for f in finestre)
+    j_max = max(f[1] for f in finestre)
+    colonne = sorted({c for _, features in modelli.values() for c in features})
+    inizio = max(0, i_min - profondita_lag(colonne))
+    matrice = calcola_matrice(df.iloc[inizio:j_max], colonne)[i_min - inizio:]
+    dati = frame_feature(matrice, colonne)
+
+    tasks = [
+        (chiave, tuple(features), i - i_min, j - i_min)
+        for chiave, features in modelli.values()
+        for i, j, _ in finestre
+    ]
+    previsioni = {chiave: np.full(len(dati), np.nan) for chiave, _ in modelli.values()}
+
+    if max_workers == 1:
+        _inizializza_worker(dati)
+        risultati = [_prevedi_finestra(*t) for t in tasks]
+    else:
+        # spawn: il server Streamlit è multithread e un fork ne copierebbe
+        # i lock nello stato in cui si trovano in quel momento
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_inizializza_worker, initargs=(dati,),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            risultati = list(pool.map(_prevedi_finestra, *zip(*tasks)))
+    for chiave, i, j, pred in risultati:
+        previsioni[chiave][i:j] = pred
+
+    # --- METRICHE (vettoriali sugli array di errore) ---
+    y = df[col_target].to_numpy(dtype=float)[i_min:j_max]
+    t = tempi[i_min:j_max]
+    cols_meteo = [c for c in COLONNE_METEO if c in df.columns]
+    if cols_meteo:
+        etichette = np.array([ETICHETTE_METEO[c] for c in cols_meteo])
+        meteo = etichette[codici_meteo(df[cols_meteo].to_numpy()[i_min:j_max])]
+    else:
+        meteo = np.full(len(y), 'n/d')
+
+    coperte = np.zeros(len(y), dtype=bool)
+    for i, j, _ in finestre:
+        coperte[i - i_min:j - i_min] = True
+
+    righe = []
+    per_finestra = []
+    for nome, (chiave, _) in modelli.items():
+        pred = previsioni[chiave]
+        err = pred - y
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ape = np.where(y != 0, np.abs(err) / np.abs(y), np.nan)
+        righe.append(pd.DataFrame({
+            'modello': nome, 'err': err, 'abs': np.abs(err), 'sq': err ** 2, 'ape': ape,
+            'ora': t.hour, 'giorno': t.dayofweek, 'meteo': meteo,
+        })[coperte])
+        for i, j, start in finestre:
+            m = metriche(y[i - i_min:j - i_min], pred[i - i_min:j - i_min])
+            per_finestra.append({'modello': nome, 'inizio': start, **m})
+
+    errori = pd.concat(righe, ignore_index=True)
+    per_giorno = _metriche_per_gruppo(errori, ['modello', 'giorno'])
+    per_giorno.index = per_giorno.index.set_levels(
+        [NOMI_GIORNI[g] for g in per_giorno.index.levels[1]], level=1)
+
+    return {
+        'riepilogo': _metriche_per_gruppo(errori, ['modello']),
+        'per_finestra': pd.DataFrame(per_finestra),
+        'per_ora': _metriche_per_gruppo(errori, ['modello', 'ora']),
+        'per_giorno': per_giorno,
+        'per_meteo': _metriche_per_gruppo(errori, ['modello', 'meteo']),
+    }
@@ -0,0 +1,95 @@
+# ==============================================================================
+# STATISTICHE DELLE CORRELAZIONI (tutte le variabili x tutti i filtri)
+# ==============================================================================
+# Per ogni variabile candidata e ogni filtro sui giorni lavorativi vengono
+# calcolati una volta per dataset media, conteggio, quartili e baffi di `cnt`
+# (e, sui dataset grandi, l'istogramma 2D dello scatter). Cambiare variabile
+# o filtro nella pagina diventa una lettura da dizionario.
+import numpy as np
+import pandas as pd
+
+from core.rendering import SOGLIA_DENSITA, densita_scatter, statistiche_box
+
+OPZIONI_ANALISI = ['hr', 'season', 'temp', 'hum', 'windspeed']
+
+# Etichetta del filtro -> valore di workingday (None = nessun filtro)
+COL_WORKINGDAY = 'workingday'
+FILTRI_WORKINGDAY = {
+    "Tutti i dati": None,
+    "Giorni Lavorativi (1)": 1,
+    "Non Lavorativi (0)": 0,
+}
+
+# Variabili con più valori distinti vengono raggruppate in bin di uguale ampiezza
+MAX_VALORI_DISCRETI = 50
+N_BIN_CONTINUE = 40
+
+
+def valori_raggruppati(serie: pd.Series) -> np.ndarray:
+    """Valori di `serie` usati come gruppi: invariati se discreti, centro del bin se continui."""
+    if serie.nunique() <= MAX_VALORI_DISCRETI:
+        return serie.to_numpy()
+
+    valori = serie.to_numpy(dtype=float)
+    bordi = np.linspace(np.nanmin(valori), np.nanmax(valori), N_BIN_CONTINUE + 1)
+    centri = (bordi[:-1] + bordi[1:]) / 2
+    idx = np.clip(np.searchsorted(bordi, valori, side='right') - 1, 0, N_BIN_CONTINUE - 1)
+    out = centri[idx]
+    out[np.isnan(valori)] = np.nan
+    return out
+
+
+def calcola_statistiche_correlazione(df: pd.DataFrame, col_y: str = 'cnt',
+                                     variabili=OPZIONI_ANALISI) -> dict:
+    """(variabile, etichetta filtro) -> {'box': statistiche per gruppo, 'densita': istogramma o None}.
+
+    'box' ha le colonne di `statistiche_box` (q1, median, q3, baffi, mean, count)
+    indicizzate per valore (o centro del bin) della variabile. I filtri su
+    workingday escono da un solo groupby per variabile su (workingday, x).
+    """
+    variabili = [v for v in variabili if v in df.columns]
+    y = df[col_y].to_numpy(dtype=float)
+    filtri = FILTRI_WORKINGDAY if COL_WORKINGDAY in df.columns else {"Tutti i dati": None}
+    wd = df[COL_WORKINGDAY].to_numpy() if COL_WORKINGDAY in df.columns else None
+
+    risultati = {}
+    for var in variabili:
+        base = pd.DataFrame({var: valori_raggruppati(df[var]), col_y: y})
+        box_tutti = statistiche_box(base, var, col_y)
+        box_per_wd = statistiche_box(base.assign(**{COL_WORKINGDAY: wd}), [COL_WORKINGDAY, var], col_y) \
+            if wd is not None else None
+
+        for etichetta, valore in filtri.items():
+            if valore is None:
+                box, maschera = box_tutti, None
+            else:
+                livello = box_per_wd.index.get_level_values(0)
+                box = box_per_wd[livello == valore].droplevel(0)
+                maschera = wd == valore
+
+            densita = None
+            n_filtrate = len(df) if maschera is None else int(maschera.sum())
+            if n_filtrate > SOGLIA_DENSITA:
+                vx = df[var].to_numpy()
+                densita = densita_scatter(vx if maschera is None else vx[maschera],
+                                          y if maschera is None else y[maschera])
+            risultati[(var, etichetta)] = {'box': box, 'densita': densita}
+    return risultati
+
+
+def in_formato_lungo(statistiche: dict) -> pd.DataFrame:
+    """Statistiche box di tutte le combinazioni in un'unica tabella (per il salvataggio)."""
+    parti = []
+    for (var, etichetta), voce in statistiche.items():
+        box = voce['box'].rename_axis('valore').reset_index()
+        parti.append(box.assign(variabile=var, filtro=etichetta))
+    return pd.concat(parti, ignore_index=True) if parti else pd.DataFrame()
+
+
+def da_formato_lungo(tabella: pd.DataFrame) -> dict:
+    """Inverso di `in_formato_lungo` (senza istogrammi di densità)."""
+    risultati = {}
+    for (var, etichetta), gruppo in tabella.groupby(['variabile', 'filtro'], sort=False):
+        box = gruppo.drop(columns=['variabile', 'filtro']).set_index('valore').rename_axis(var)
+        risultati[(var, etichetta)] = {'box': box, 'densita': None}
+    return risultati
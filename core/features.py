@@ -0,0 +1,284 @@
+# ==============================================================================
+# PIPELINE DI FEATURE CONDIVISA (notebook di training + pagina Forecast)
+# ==============================================================================
+# Dal frame orario (anche il CSV grezzo) alla matrice di input del modello:
+# ogni feature richiesta viene presa dal frame se esiste, altrimenti ricavata
+# - dal timestamp (hr, mnth, weekday, yr, season, workingday, Orario_punta)
+#   hr, mnth, weekday e yr vengono sempre dal timestamp, come nel notebook
+#   orario: il CSV grezzo ha weekday 0 = domenica e yr 0/1, il modello
+#   weekday 0 = lunedì e l'anno effettivo
+# - come One-Hot '<colonna>_<valore>' (weathersit_1.0, mnth_3, weekday_0, ...)
+# - come lag / media mobile di cnt con i nomi di core.lags (cnt_lag_24, ...),
+#   cercati per timestamp come dopo un reindex orario (il CSV grezzo ha ore
+#   mancanti): NaN dove l'ora richiesta non c'è
+# Il risultato è un array float32 C-contiguo, salvato su disco per hash dei
+# dati e delle feature: rerun, sessioni e notebook lo rileggono memory-mapped
+# e la predict non deve più selezionare colonne dal DataFrame.
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+
+from core.ingestion import CACHE_DIR, _evict_lru
+from core.lags import COL_TARGET, interpreta_lag
+
+FEATURE_DIR = CACHE_DIR / "feature"
+# Spazio massimo occupato dalle matrici salvate prima dell'eviction LRU
+FEATURE_MAX_BYTES = int(os.environ.get("DASHBOARD_FEATURE_MAX_MB", "2048")) * 1024 * 1024
+# Da incrementare quando cambia il modo di ricavare una feature: le matrici
+# salvate con la logica precedente non vengono più rilette
+VERSIONE_FEATURE = 2
+
+# Fasce orarie di punta (stessa definizione del notebook orario)
+ORE_PUNTA = (7, 8, 9, 17, 18, 19)
+
+# Feature di calendario ricavabili dal solo timestamp
+CALENDARIO = {
+    'hr': lambda t: t.hour,
+    'mnth': lambda t: t.month,
+    'weekday': lambda t: t.dayofweek,  # 0 = lunedì, come DatetimeIndex.dayofweek
+    'yr': lambda t: t.year,
+    # 1 inverno (dic-feb), 2 primavera, 3 estate, 4 autunno
+    'season': lambda t: (t.month % 12 + 3) // 3,
+}
+# Campi ricavati dal timestamp anche se il frame ha già una colonna omonima
+DAL_TIMESTAMP = ('hr', 'mnth', 'weekday', 'yr')
+
+# Colonne categoriche espandibili in One-Hot e valori sempre ammessi, anche
+# se assenti dai dati (es. un blocco live di un solo mese). Per 'yr' (None)
+# valgono solo i valori presenti nella colonna.
+CATEGORICHE = {
+    'weathersit': range(1, 5),
+    'season': range(1, 5),
+    'mnth': range(1, 13),
+    'hr': range(24),
+    'weekday': range(7),
+    'yr': None,
+    'holiday': (0, 1),
+    'workingday': (0, 1),
+}
+
+
+def tempi_dati(df: pd.DataFrame) -> pd.DatetimeIndex:
+    """Timestamp orario di ogni riga: indice, 'dteday' + 'hr' o prima colonna."""
+    if isinstance(df.index, pd.DatetimeIndex):
+        return df.index
+    col_data = df.columns[0]
+    if not pd.api.types.is_datetime64_any_dtype(df[col_data]) and {'dteday', 'hr'} <= set(df.columns):
+        # CSV grezzo: la data è in 'dteday' e l'ora in una colonna separata
+        return pd.DatetimeIndex(pd.to_datetime(df['dteday']) + pd.to_timedelta(df['hr'], unit='h'))
+    return pd.DatetimeIndex(pd.to_datetime(df[col_data]))
+
+
+class _Sorgente:
+    """Colonne del frame + colonne derivate, calcolate una sola volta."""
+
+    def __init__(self, df: pd.DataFrame, gruppi=None):
+        self.df = df
+        self.gruppi = None if gruppi is None else np.asarray(gruppi)
+        self._tempi = None
+        self._cache = {}
+
+    @property
+    def tempi(self) -> pd.DatetimeIndex:
+        if self._tempi is None:
+            self._tempi = tempi_dati(self.df)
+        return self._tempi
+
+    def base(self, nome: str):
+        """Colonna del frame o di calendario come array, None se non ricavabile."""
+        if nome in self._cache:
+            return self._cache[nome]
+        if nome in self.df.columns and nome not in DAL_TIMESTAMP:
+            valori = self.df[nome].to_numpy()
+        elif nome in CALENDARIO:
+            valori = np.asarray(CALENDARIO[nome](self.tempi))
+        elif nome == 'workingday':
+            festivo = (self.df['holiday'].to_numpy() == 1 if 'holiday' in self.df.columns
+                       else np.zeros(len(self.df), dtype=bool))
+            valori = ((np.asarray(self.tempi.dayofweek) < 5) & ~festivo).astype(np.int8)
+        elif nome == 'Orario_punta':
+            valori = np.isin(self.base('hr'), ORE_PUNTA).astype(np.int8)
+        else:
+            return None
+        self._cache[nome] = valori
+        return valori
+
+    def one_hot(self, nome: str):
+        """Indicatore 0/1 per '<categorica>_<valore>' (es. 'weathersit_1.0').
+
+        None se la colonna non è tra le CATEGORICHE o il valore non è né
+        ammesso né presente nei dati: 'temp_squared' resta una feature mancante.
+        """
+        nome_colonna, _, testo = nome.rpartition('_')
+        if nome_colonna not in CATEGORICHE:
+            return None
+        try:
+            valore = float(testo)
+        except ValueError:
+            return None
+        colonna = self.base(nome_colonna)
+        if colonna is None:
+            return None
+        ammessi = CATEGORICHE[nome_colonna]
+        if not (ammessi is not None and valore in ammessi) and valore not in self.valori(nome_colonna):
+            return None
+        return (colonna.astype(float) == valore).astype(np.int8)
+
+    def valori(self, nome: str) -> set:
+        """Valori distinti (float) della colonna base `nome`."""
+        chiave = ('valori', nome)
+        if chiave not in self._cache:
+            self._cache[chiave] = set(pd.unique(self.base(nome).astype(float)).tolist())
+        return self._cache[chiave]
+
+    @property
+    def ore(self) -> np.ndarray:
+        """Chiave intera crescente per riga: ore dall'inizio, più uno scarto per serie.
+
+        Con i `gruppi` (righe ordinate per serie e tempo) ogni serie occupa un
+        intervallo di chiavi separato, così una ricerca non esce dalla serie.
+        """
+        if ('ore',) not in self._cache:
+            ore = self.tempi.values.astype('datetime64[h]').astype(np.int64)
+            ore = ore - ore.min() if len(ore) else ore
+            if self.gruppi is not None and len(ore):
+                ore = ore + self.gruppi.astype(np.int64) * (int(ore.max()) + 1)
+            self._cache[('ore',)] = ore
+        return self._cache[('ore',)]
+
+    def _posizioni(self, scarto: int) -> tuple[np.ndarray, np.ndarray]:
+        """(posizione, trovata) della riga `scarto` ore prima di ogni riga."""
+        ore = self.ore
+        cercate = ore - scarto
+        pos = np.searchsorted(ore, cercate)
+        trovate = pos < len(ore)
+        trovate[trovate] = ore[pos[trovate]] == cercate[trovate]
+        if self.gruppi is not None:
+            # Prima dell'inizio della serie la chiave cade nella serie precedente
+            trovate[trovate] = self.gruppi[pos[trovate]] == self.gruppi[trovate]
+        return pos, trovate
+
+    def lag(self, nome: str):
+        """Lag o media mobile di cnt (NaN dove manca lo storico), None se non è un lag.
+
+        Come uno shift dopo il reindex su tutte le ore: il lag a k ore è il cnt
+        del timestamp t - k ore, la media a w ore usa le ore da t-w a t-1 e
+        vale NaN se una di esse manca.
+        """
+        tipo_ore = interpreta_lag(nome)
+        if tipo_ore is None or COL_TARGET not in self.df.columns:
+            return None
+        tipo, ore = tipo_ore
+        serie = self.df[COL_TARGET].to_numpy(dtype=float, na_value=np.nan)
+        valori = np.full(len(serie), np.nan)
+        if tipo == 'lag':
+            pos, trovate = self._posizioni(ore)
+            valori[trovate] = serie[pos[trovate]]
+            return valori
+
+        # Media: le w ore da t-w a t-1 ci sono tutte se le loro righe sono
+        # w righe consecutive (timestamp unici per serie)
+        inizio, trovato_inizio = self._posizioni(ore)
+        fine, trovata_fine = self._posizioni(1)
+        complete = trovato_inizio & trovata_fine & (fine - inizio == ore - 1)
+        if ('somme', COL_TARGET) not in self._cache:
+            # Somme cumulative di cnt e dei suoi NaN: ogni media costa O(1)
+            self._cache[('somme', COL_TARGET)] = (
+                np.concatenate([[0.0], np.cumsum(np.nan_to_num(serie))]),
+                np.concatenate([[0], np.cumsum(np.isnan(serie))]),
+            )
+        somme, nan = self._cache[('somme', COL_TARGET)]
+        i, j = inizio[complete], fine[complete] + 1
+        medie = (somme[j] - somme[i]) / ore
+        medie[nan[j] - nan[i] > 0] = np.nan
+        valori[complete] = medie
+        return valori
+
+    def colonna(self, nome: str):
+        for costruttore in (self.base, self.lag, self.one_hot):
+            valori = costruttore(nome)
+            if valori is not None:
+                return valori
+        return None
+
+
+def feature_mancanti(df: pd.DataFrame, features) -> list:
+    """Feature né presenti nel frame né ricavabili dalla pipeline."""
+    # Colonne, calendario e lag si riconoscono dal solo schema; i One-Hot
+    # possono dipendere dai valori presenti, letti solo per loro
+    vuota = _Sorgente(df.head(0))
+    completa = _Sorgente(df)
+    return [c for c in features
+            if vuota.base(c) is None and vuota.lag(c) is None and completa.one_hot(c) is None]
+
+
+def calcola_matrice(df: pd.DataFrame, features, gruppi=None) -> np.ndarray:
+    """Matrice (righe, feature) float32 C-contigua nell'ordine di `features`.
+
+    `df` deve essere ordinato nel tempo (per serie e tempo se si passano i
+    `gruppi`, un codice per riga): i lag si cercano per ricerca binaria sui
+    timestamp.
+    """
+    features = list(features)
+    sorgente = _Sorgente(df, gruppi)
+    matrice = np.empty((len(df), len(features)), dtype=np.float32)
+    mancanti = []
+    for j, nome in enumerate(features):
+        valori = sorgente.colonna(nome)
+        if valori is None:
+            mancanti.append(nome)
+        else:
+            matrice[:, j] = valori
+    if mancanti:
+        raise KeyError(f"Feature non presenti né ricavabili dai dati: {mancanti}")
+    return matrice
+
+
+def chiave_matrice(chiave_dati: str, features) -> str:
+    testo = f"v{VERSIONE_FEATURE}\n{chiave_dati}\n" + "\n".join(map(str, features))
+    return hashlib.blake2b(testo.encode(), digest_size=16).hexdigest()
+
+
+def matrice_feature(df: pd.DataFrame, features, chiave: str | None = None, gruppi=None,
+                    cartella=None) -> np.ndarray:
+    """Come `calcola_matrice`, con cache su disco se è data la `chiave` dei dati.
+
+    La chiave deve identificare contenuto e ordine delle righe (es. hash del
+    CSV + colonna di ordinamento). Una matrice già salvata viene riletta
+    memory-mapped, in sola lettura.
+    """
+    if chiave is None:
+        return calcola_matrice(df, features, gruppi)
+
+    path = (cartella or FEATURE_DIR) / f"{chiave_matrice(chiave, features)}.npy"
+    if path.exists():
+        try:
+            matrice = np.load(path, mmap_mode='r')
+            if matrice.shape == (len(df), len(features)):
+                os.utime(path)  # segna la matrice come usata di recente
+                return matrice
+        except Exception:
+            pass
+        # Matrice illeggibile o di un altro dataset: la rigeneriamo
+        path.unlink(missing_ok=True)
+
+    matrice = calcola_matrice(df, features, gruppi)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Scrittura atomica, come per gli snapshot Parquet
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp, 'wb') as f:
+            np.save(f, matrice)
+        os.replace(tmp, path)
+        _evict_lru(path.parent, FEATURE_MAX_BYTES, "*.npy")
+    except Exception:
+        # La cache è solo un'ottimizzazione: la matrice calcolata è comunque valida
+        pass
+    return matrice
+
+
+def frame_feature(matrice: np.ndarray, features) -> pd.DataFrame:
+    """Vista DataFrame (senza copia) della matrice, per modelli con `feature_names_in_`."""
+    return pd.DataFrame(matrice, columns=list(features), copy=False)
@@ -0,0 +1,88 @@
+# ==============================================================================
+# FORECAST BATCH SULL'INTERA FINESTRA DI SIMULAZIONE
+# ==============================================================================
+# Una sola chiamata vettorizzata a `model.predict` per tutte le righe della
+# finestra (a blocchi se la finestra è molto grande): per modelli sklearn /
+# XGBoost il costo è simile a quello di una singola riga.
+import numpy as np
+import pandas as pd
+
+from core.features import frame_feature
+from core.lags import BufferLag, feature_lag, ore_consecutive, profondita_lag
+
+# Righe per chiamata a predict: limita la memoria dei modelli che allocano
+# strutture intermedie proporzionali all'input
+DIMENSIONE_BLOCCO = 250_000
+
+
+def predici_batch(model, X: pd.DataFrame, dimensione_blocco: int = DIMENSIONE_BLOCCO) -> np.ndarray:
+    """Previsioni per tutte le righe di `X` come array float 1D."""
+    n = len(X)
+    if n <= dimensione_blocco:
+        return np.asarray(model.predict(X), dtype=float).ravel()
+
+    out = np.empty(n, dtype=float)
+    for inizio in range(0, n, dimensione_blocco):
+        fine = min(inizio + dimensione_blocco, n)
+        out[inizio:fine] = np.asarray(model.predict(X.iloc[inizio:fine]), dtype=float).ravel()
+    return out
+
+
+def previsioni_serie(model, matrice: np.ndarray, features) -> np.ndarray:
+    """Previsione a un passo per ogni riga della matrice di feature (core.features).
+
+    Le righe con feature mancanti (es. lag di cnt senza storico sufficiente)
+    restano NaN.
+    """
+    valide = ~np.isnan(matrice).any(axis=1)
+    out = np.full(len(matrice), np.nan)
+    if valide.any():
+        X = matrice if valide.all() else matrice[valide]
+        out[valide] = predici_batch(model, frame_feature(X, features))
+    return out
+
+
+def previsione_ricorsiva(model, X: pd.DataFrame, y: np.ndarray, partenze, orizzonte: int,
+                         features=None, tempi=None) -> np.ndarray:
+    """Previsioni multi-step da molti punti di partenza in parallelo.
+
+    `X` e `y` sono le righe orarie ordinate nel tempo (feature esogene e cnt
+    osservato); `partenze` sono posizioni in `X`. Ad ogni passo le feature di
+    lag vengono prese dal ring buffer (storico + previsioni precedenti) e tutte
+    le partenze sono previste con una sola `predict`.
+    Con i `tempi` delle righe, le partenze il cui storico o orizzonte include
+    ore mancanti restano NaN.
+    Restituisce un array (n_partenze, orizzonte).
+    """
+    features = list(features if features is not None else model.feature_names_in_)
+    partenze = np.asarray(partenze, dtype=np.int64)
+    profondita = profondita_lag(features)
+    if len(partenze) and (partenze.min() < profondita or partenze.max() + orizzonte > len(X)):
+        raise ValueError(f"Servono {profondita} ore di storico prima e {orizzonte} righe dopo ogni partenza.")
+
+    out = np.full((len(partenze), orizzonte), np.nan)
+    valide = np.ones(len(partenze), dtype=bool)
+    if tempi is not None:
+        valide = ore_consecutive(tempi, partenze - profondita, profondita + orizzonte)
+    partenze = partenze[valide]
+    if not len(partenze):
+        return out
+
+    cols_lag = feature_lag(features)
+    cols_esogene = [c for c in features if c not in cols_lag]
+    esogene = X[cols_esogene].to_numpy(dtype=float)
+
+    # Finestra di storico per partenza: (n_partenze, profondita), dal più vecchio
+    y = np.asarray(y, dtype=float)
+    buffer = BufferLag.per_feature(y[partenze[:, None] - profondita + np.arange(profondita)], features)
+
+    passo = pd.DataFrame(np.zeros((len(partenze), len(features))), columns=features)
+    for h in range(orizzonte):
+        passo[cols_esogene] = esogene[partenze + h]
+        lag = buffer.features()
+        for c in cols_lag:
+            passo[c] = lag[c]
+        previsti = predici_batch(model, passo)
+        out[valide, h] = previsti
+        buffer.aggiungi(previsti)
+    return out
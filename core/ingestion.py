@@ -0,0 +1,113 @@
+# ==============================================================================
+# INGESTIONE CSV CON CACHE SU DISCO (snapshot colonnari Parquet)
+# ==============================================================================
+# Il CSV caricato viene identificato dall'hash del contenuto: il parsing
+# (inferenza dei dtype + conversione delle date) avviene una sola volta e il
+# risultato viene salvato come snapshot Parquet. Ricaricare lo stesso file
+# legge lo snapshot colonnare invece di rifare il parsing del testo.
+import hashlib
+import io
+import os
+from pathlib import Path
+
+import pandas as pd
+
+from core.weather import COLONNE_METEO
+
+CACHE_DIR = Path(os.environ.get("DASHBOARD_CACHE_DIR", ".cache"))
+SNAPSHOT_DIR = CACHE_DIR / "snapshot"
+# Spazio massimo occupato dagli snapshot prima dell'eviction LRU
+SNAPSHOT_MAX_BYTES = int(os.environ.get("DASHBOARD_SNAPSHOT_MAX_MB", "2048")) * 1024 * 1024
+
+# Colonne data conosciute, convertite una volta sola in fase di parsing
+COLONNE_DATA = ["dteday"]
+
+# Da incrementare quando cambia il risultato del parsing: gli snapshot
+# salvati con una versione precedente non vengono più letti
+VERSIONE_SNAPSHOT = 2
+
+
+def hash_contenuto(data: bytes) -> str:
+    """Hash del contenuto grezzo del file, usato come chiave di cache."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def _parse_csv(data: bytes) -> pd.DataFrame:
+    return converti_date(pd.read_csv(io.BytesIO(data)))
+
+
+def converti_date(df: pd.DataFrame) -> pd.DataFrame:
+    """Converte in datetime le colonne data note e la prima colonna se testuale.
+
+    Un CSV grezzo riceve anche il timestamp orario in prima colonna e le
+    colonne One-Hot del meteo, così tutte le pagine lo leggono come gli altri.
+    """
+    # Conversione data se esiste colonna 'dteday' (comune in questi dataset)
+    for col in COLONNE_DATA:
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col])
+
+    # Le pagine usano la prima colonna come asse temporale: se è testuale la
+    # convertiamo qui, così i rerun non devono rifare il parsing delle stringhe
+    col_data = df.columns[0]
+    if df[col_data].dtype == object or pd.api.types.is_string_dtype(df[col_data]):
+        try:
+            df[col_data] = pd.to_datetime(df[col_data])
+        except (ValueError, TypeError):
+            pass
+
+    # CSV grezzo (hour.csv originale): la prima colonna è un contatore, il
+    # timestamp orario si ricava da 'dteday' + 'hr' e diventa la prima colonna
+    if (not pd.api.types.is_datetime64_any_dtype(df[col_data]) and {'dteday', 'hr'} <= set(df.columns)
+            and 'datetime' not in df.columns):
+        df.insert(0, 'datetime', df['dteday'] + pd.to_timedelta(df['hr'], unit='h'))
+
+    # Meteo come codice 1-4: aggiungiamo le colonne One-Hot usate dalle pagine
+    if 'weathersit' in df.columns and not any(c in df.columns for c in COLONNE_METEO):
+        for codice, col in enumerate(COLONNE_METEO, start=1):
+            df[col] = (df['weathersit'] == codice).astype(int)
+    return df
+
+
+def _evict_lru(cartella: Path, max_bytes: int, pattern: str = "*.parquet") -> None:
+    # Ordiniamo per ultimo utilizzo (mtime, aggiornato ad ogni hit)
+    files = sorted(cartella.glob(pattern), key=lambda p: p.stat().st_mtime)
+    totale = sum(p.stat().st_size for p in files)
+    for p in files:
+        if totale <= max_bytes:
+            break
+        totale -= p.stat().st_size
+        p.unlink(missing_ok=True)
+
+
+def _salva_snapshot(df: pd.DataFrame, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Scrittura atomica: un'altra sessione non legge mai un file a metà
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    df.to_parquet(tmp, index=True)
+    os.replace(tmp, path)
+    _evict_lru(path.parent, SNAPSHOT_MAX_BYTES)
+
+
+def carica_csv(data: bytes, cartella: Path | None = None) -> tuple[str, pd.DataFrame]:
+    """Restituisce (hash, DataFrame) leggendo lo snapshot se già presente."""
+    chiave = hash_contenuto(data)
+    path = (cartella or SNAPSHOT_DIR) / f"{chiave}.v{VERSIONE_SNAPSHOT}.parquet"
+
+    if path.exists():
+        try:
+            df = pd.read_parquet(path)
+            os.utime(path)  # segna lo snapshot come usato di recente
+            return chiave, df
+        except Exception:
+            # Snapshot corrotto o illeggibile: lo rigeneriamo
+            path.unlink(missing_ok=True)
+
+    df = _parse_csv(data)
+    try:
+        _salva_snapshot(df, path)
+    except Exception:
+        # Lo snapshot è solo un'ottimizzazione: senza pyarrow o senza spazio
+        # su disco la dashboard continua a funzionare con il parsing diretto
+        pass
+    return chiave, df
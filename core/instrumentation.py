@@ -0,0 +1,110 @@
+# ==============================================================================
+# STRUMENTAZIONE PER RERUN (tempo, memoria, righe per sezione)
+# ==============================================================================
+# Ogni sezione logica di una pagina viene misurata ad ogni rerun: tempo
+# reale, picco di memoria allocata (tracemalloc, se attivo) e righe
+# elaborate. Ogni misura viene scritta subito come riga JSON nel log locale,
+# così resta registrata anche se la pagina si interrompe con st.stop().
+import json
+import os
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+
+LOG_PATH = Path(os.environ.get("DASHBOARD_PERF_LOG", "logs/dashboard_perf.jsonl"))
+# Con DASHBOARD_TRACE_MEMORY=1 il picco di memoria viene misurato sempre,
+# altrimenti solo quando il pannello di debug è attivo
+TRACCIA_MEMORIA = os.environ.get("DASHBOARD_TRACE_MEMORY", "0") == "1"
+
+_lock_log = threading.Lock()
+
+# tracemalloc è globale al processo e condiviso da tutte le sessioni: viene
+# avviato dalla prima sezione che misura la memoria e fermato (solo se
+# l'abbiamo avviato noi) quando termina l'ultima, mai durante la sezione di
+# un'altra sessione. Il picco viene azzerato solo se nessun'altra sezione è
+# in misura: con sezioni sovrapposte il picco riportato include anche le
+# allocazioni delle altre (limite superiore, mai negativo).
+_lock_memoria = threading.Lock()
+_sezioni_in_misura = 0
+# True se tracemalloc è stato avviato da questo modulo (e non da altri strumenti)
+_tracemalloc_nostro = False
+
+
+def _inizia_misura_memoria() -> int:
+    """Registra una sezione in misura e restituisce la memoria allocata corrente."""
+    global _sezioni_in_misura, _tracemalloc_nostro
+    with _lock_memoria:
+        if _sezioni_in_misura == 0:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                _tracemalloc_nostro = True
+            tracemalloc.reset_peak()
+        _sezioni_in_misura += 1
+        return tracemalloc.get_traced_memory()[0]
+
+
+def _termina_misura_memoria() -> int:
+    """Chiude una sezione in misura e restituisce il picco dall'ultimo azzeramento."""
+    global _sezioni_in_misura, _tracemalloc_nostro
+    with _lock_memoria:
+        picco = tracemalloc.get_traced_memory()[1]
+        _sezioni_in_misura -= 1
+        if _sezioni_in_misura == 0 and _tracemalloc_nostro:
+            tracemalloc.stop()
+            _tracemalloc_nostro = False
+        return picco
+
+
+class Strumentazione:
+    """Raccoglie le misure delle sezioni di un singolo rerun di una pagina."""
+
+    def __init__(self, pagina: str, traccia_memoria: bool = TRACCIA_MEMORIA,
+                 log_path: Path | None = LOG_PATH, al_termine=None):
+        self.pagina = pagina
+        self.rerun = uuid.uuid4().hex[:12]
+        self.log_path = log_path
+        self.al_termine = al_termine
+        self.traccia_memoria = traccia_memoria
+        self.sezioni = []
+
+    @contextmanager
+    def sezione(self, nome: str, righe: int | None = None):
+        """Misura il blocco; il dizionario restituito permette di aggiornare 'righe'."""
+        record = {'sezione': nome, 'righe': righe}
+        misura_memoria = self.traccia_memoria
+        memoria_iniziale = _inizia_misura_memoria() if misura_memoria else 0
+        inizio = time.perf_counter()
+        try:
+            yield record
+        finally:
+            record['secondi'] = time.perf_counter() - inizio
+            # Picco allocato durante la sezione, oltre a quanto già in memoria
+            record['picco_mb'] = (
+                max(0, _termina_misura_memoria() - memoria_iniziale) / 1024 ** 2
+                if misura_memoria else None
+            )
+            self.sezioni.append(record)
+            self._scrivi(record)
+            if self.al_termine is not None:
+                self.al_termine(self.sezioni)
+
+    def _scrivi(self, record: dict) -> None:
+        if self.log_path is None:
+            return
+        riga = {
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'pagina': self.pagina,
+            'rerun': self.rerun,
+            **record,
+        }
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with _lock_log, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(riga) + "\n")
+        except OSError:
+            # Il log non deve mai bloccare la dashboard
+            pass
@@ -0,0 +1,112 @@
+# ==============================================================================
+# FEATURE DI LAG DI cnt (nomi condivisi + ring buffer per la previsione ricorsiva)
+# ==============================================================================
+# Un modello che usa i valori passati di `cnt` li trova in colonne con questi
+# nomi. Durante la previsione multi-step i valori futuri non esistono: vengono
+# sostituiti dalle previsioni, tenute in un ring buffer aggiornato in O(1) per
+# passo (una scrittura + una somma mobile per finestra, nessun ricalcolo sul frame).
+import re
+
+import numpy as np
+import pandas as pd
+
+COL_TARGET = 'cnt'
+
+# Ore precedenti, stessa ora di ieri, stessa ora della settimana scorsa
+LAG_ORE = (1, 2, 3, 24, 168)
+# Medie mobili delle ultime N ore
+FINESTRE_MEDIA = (24, 168)
+
+
+def nome_lag(ore: int) -> str:
+    return f"{COL_TARGET}_lag_{ore}"
+
+
+def nome_media(ore: int) -> str:
+    return f"{COL_TARGET}_media_{ore}h"
+
+
+# Qualsiasi lag o media nel formato dei nomi sopra (es. cnt_lag_1 .. cnt_lag_24
+# dei modelli addestrati nel notebook orario)
+_PATTERN_LAG = re.compile(rf"{COL_TARGET}_lag_(\d+)")
+_PATTERN_MEDIA = re.compile(rf"{COL_TARGET}_media_(\d+)h")
+
+
+def interpreta_lag(nome: str):
+    """('lag', ore) o ('media', ore) se `nome` è una feature di lag di cnt, altrimenti None."""
+    for tipo, pattern in (('lag', _PATTERN_LAG), ('media', _PATTERN_MEDIA)):
+        trovato = pattern.fullmatch(str(nome))
+        if trovato and int(trovato.group(1)) > 0:
+            return tipo, int(trovato.group(1))
+    return None
+
+
+def feature_lag(features) -> list:
+    """Le feature di `features` che sono lag o medie mobili di cnt."""
+    return [c for c in features if interpreta_lag(c) is not None]
+
+
+def profondita_lag(features) -> int:
+    """Ore di storico richieste dalle feature di lag di `features` (0 se nessuna)."""
+    return max((interpreta_lag(c)[1] for c in feature_lag(features)), default=0)
+
+
+def ore_consecutive(tempi, inizi, n_righe: int) -> np.ndarray:
+    """Per ogni posizione in `inizi`: True se le `n_righe` righe da lì sono ore consecutive.
+
+    I lag sono spostamenti di riga: valgono come lag orari solo dove il CSV
+    non ha ore mancanti (il CSV grezzo ne ha circa 165). `tempi` è ordinato.
+    """
+    inizi = np.asarray(inizi, dtype=np.int64)
+    if n_righe <= 1:
+        return np.ones(len(inizi), dtype=bool)
+    valori = np.asarray(tempi, dtype='datetime64[ns]')
+    return valori[inizi + n_righe - 1] - valori[inizi] == np.timedelta64(n_righe - 1, 'h')
+
+
+class BufferLag:
+    """Ultimi valori di cnt per molti punti di partenza in parallelo.
+
+    `storico` ha forma (n_partenze, profondità), dal più vecchio al più recente,
+    con profondità almeno pari al lag e alla finestra più lunghi richiesti.
+    Tutte le partenze avanzano insieme, quindi basta un solo puntatore.
+    """
+
+    def __init__(self, storico: np.ndarray, lag_ore=LAG_ORE, finestre=FINESTRE_MEDIA):
+        self._buf = np.array(storico, dtype=float)
+        self._profondita = self._buf.shape[1]
+        self._lag_ore = tuple(lag_ore)
+        self._finestre = tuple(finestre)
+        # Posizione della prossima scrittura (= valore più vecchio)
+        self._pos = 0
+        self._somme = {w: self._buf[:, -w:].sum(axis=1) for w in self._finestre}
+
+    @classmethod
+    def per_feature(cls, storico: np.ndarray, features):
+        """Buffer con i soli lag e finestre che compaiono in `features`."""
+        parsed = [interpreta_lag(c) for c in feature_lag(features)]
+        return cls(
+            storico,
+            lag_ore=sorted({ore for tipo, ore in parsed if tipo == 'lag'}),
+            finestre=sorted({ore for tipo, ore in parsed if tipo == 'media'}),
+        )
+
+    def _valore(self, ore: int) -> np.ndarray:
+        return self._buf[:, (self._pos - ore) % self._profondita]
+
+    def features(self) -> dict[str, np.ndarray]:
+        """Feature di lag correnti, un array per nome di colonna."""
+        out = {nome_lag(k): self._valore(k) for k in self._lag_ore}
+        out.update({nome_media(w): self._somme[w] / w for w in self._finestre})
+        return out
+
+    def aggiungi(self, valori: np.ndarray) -> None:
+        """Inserisce il valore dell'ora successiva (uno per partenza)."""
+        if not self._profondita:
+            # Modello senza lag di cnt: non c'è storico da aggiornare
+            return
+        for w in self._finestre:
+            # Esce dalla finestra il valore di w ore fa
+            self._somme[w] += valori - self._valore(w)
+        self._buf[:, self._pos] = valori
+        self._pos = (self._pos + 1) % self._profondita
@@ -0,0 +1,236 @@
+# ==============================================================================
+# MODALITÀ LIVE (file in append o cartella di CSV, aggiornamenti incrementali)
+# ==============================================================================
+# Ad ogni controllo vengono lette solo le righe nuove (offset in byte per
+# file). Le righe nuove aggiornano gli accumulatori dello streaming (statistiche,
+# medie meteo), il rollup giornaliero con il KPI di efficienza e, se c'è un
+# modello, vengono previste solo loro: il costo di un aggiornamento dipende
+# dalle righe arrivate, non dalla storia accumulata.
+import io
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.aggregates import COLONNE_VOLUME
+from core.features import calcola_matrice
+from core.forecast import previsioni_serie
+from core.ingestion import converti_date
+from core.lags import profondita_lag
+from core.streaming import AccumulatoreStreaming
+
+CAPACITA_INIZIALE = 1024
+
+
+class SorgenteLive:
+    """Righe nuove di un CSV in append, o di tutti i CSV di una cartella."""
+
+    def __init__(self, percorso):
+        self.percorso = Path(percorso)
+        self._offset = {}
+        self._intestazioni = {}
+
+    def _files(self) -> list[Path]:
+        if self.percorso.is_dir():
+            return sorted(self.percorso.glob("*.csv"))
+        return [self.percorso] if self.percorso.exists() else []
+
+    def _leggi_file(self, path: Path) -> bytes:
+        offset = self._offset.get(path, 0)
+        dimensione = path.stat().st_size
+        if dimensione < offset:
+            # File troncato o ruotato: si riparte dall'inizio
+            offset = 0
+            self._intestazioni.pop(path, None)
+        if dimensione == offset:
+            return b""
+
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(dimensione - offset)
+        # Una riga ancora in scrittura (senza a capo finale) viene letta al giro dopo
+        fine_riga = data.rfind(b"\n")
+        if fine_riga < 0:
+            return b""
+        data = data[:fine_riga + 1]
+        self._offset[path] = offset + len(data)
+
+        if path not in self._intestazioni:
+            intestazione, _, data = data.partition(b"\n")
+            self._intestazioni[path] = intestazione + b"\n"
+        return self._intestazioni[path] + data if data.strip() else b""
+
+    def leggi_nuove(self) -> pd.DataFrame | None:
+        """Righe comparse dall'ultima lettura (None se non ce ne sono)."""
+        blocchi = []
+        for path in self._files():
+            data = self._leggi_file(path)
+            if data:
+                blocchi.append(converti_date(pd.read_csv(io.BytesIO(data))))
+        if not blocchi:
+            return None
+        return pd.concat(blocchi, ignore_index=True) if len(blocchi) > 1 else blocchi[0]
+
+
+class RollupGiornaliero:
+    """Somme giornaliere delle colonne di volume e KPI di efficienza, in append.
+
+    I dati live arrivano in ordine di tempo: una riga nuova tocca l'ultimo
+    giorno (somma in place) o ne apre di nuovi (append su array con capacità
+    raddoppiata). Solo i giorni toccati ricalcolano il KPI.
+    """
+
+    def __init__(self, colonne=COLONNE_VOLUME):
+        self.colonne = list(colonne)
+        self._giorni = np.empty(CAPACITA_INIZIALE, dtype='datetime64[D]')
+        self._somme = np.zeros((CAPACITA_INIZIALE, len(self.colonne)))
+        self._kpi = np.full(CAPACITA_INIZIALE, np.nan)
+        self.n = 0
+
+    def _cresci(self, minimo: int) -> None:
+        capacita = len(self._giorni)
+        while capacita < minimo:
+            capacita *= 2
+        if capacita == len(self._giorni):
+            return
+        self._giorni = np.resize(self._giorni, capacita)
+        somme = np.zeros((capacita, len(self.colonne)))
+        somme[:self.n] = self._somme[:self.n]
+        self._somme = somme
+        self._kpi = np.resize(self._kpi, capacita)
+
+    def aggiorna(self, tempi: pd.Series, chunk: pd.DataFrame) -> None:
+        valori = chunk.reindex(columns=self.colonne).fillna(0).to_numpy(dtype=float)
+        giorni_righe = tempi.to_numpy().astype('datetime64[D]')
+        giorni, inverso = np.unique(giorni_righe, return_inverse=True)
+        parziali = np.zeros((len(giorni), len(self.colonne)))
+        np.add.at(parziali, inverso, valori)
+
+        pos = np.searchsorted(self._giorni[:self.n], giorni)
+        esistenti = pos < self.n
+        esistenti[esistenti] = self._giorni[pos[esistenti]] == giorni[esistenti]
+        self._somme[pos[esistenti]] += parziali[esistenti]
+        toccati = [pos[esistenti]]
+
+        nuovi = ~esistenti
+        if nuovi.any():
+            if self.n and giorni[nuovi][0] < self._giorni[self.n - 1]:
+                # Giorni arretrati mai visti (raro): reinserimento ordinato
+                self._inserisci(giorni[nuovi], parziali[nuovi])
+                toccati = [np.arange(self.n)]
+            else:
+                k = int(nuovi.sum())
+                self._cresci(self.n + k)
+                self._giorni[self.n:self.n + k] = giorni[nuovi]
+                self._somme[self.n:self.n + k] = parziali[nuovi]
+                toccati.append(np.arange(self.n, self.n + k))
+                self.n += k
+        self._aggiorna_kpi(np.concatenate(toccati))
+
+    def _inserisci(self, giorni, parziali) -> None:
+        tutti_giorni = np.concatenate([self._giorni[:self.n], giorni])
+        ordine = np.argsort(tutti_giorni, kind='stable')
+        tutte_somme = np.concatenate([self._somme[:self.n], parziali])[ordine]
+        # _cresci copia le prime self.n righe: va chiamato prima di aggiornare n
+        self._cresci(len(tutti_giorni))
+        self.n = len(tutti_giorni)
+        self._giorni[:self.n] = tutti_giorni[ordine]
+        self._somme[:self.n] = tutte_somme
+
+    def _aggiorna_kpi(self, righe: np.ndarray) -> None:
+        if 'registered' not in self.colonne or 'cnt' not in self.colonne:
+            return
+        registrati = self._somme[righe, self.colonne.index('registered')]
+        totale = self._somme[righe, self.colonne.index('cnt')]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            self._kpi[righe] = np.where(totale > 0, registrati / totale * 100, np.nan)
+
+    def tabella(self) -> pd.DataFrame:
+        """Come il livello 'day' del cubo: somme giornaliere più 'kpi_efficiency_rate'."""
+        out = pd.DataFrame(
+            self._somme[:self.n],
+            index=pd.DatetimeIndex(self._giorni[:self.n], name='Date_Index'),
+            columns=self.colonne
+        )
+        out['kpi_efficiency_rate'] = self._kpi[:self.n]
+        return out
+
+
+def _accoda(blocchi: list, blocco) -> None:
+    # Fusione dei blocchi di dimensione simile (come un contatore binario):
+    # O(log n) blocchi, e ogni riga viene copiata O(log n) volte in totale
+    blocchi.append(blocco)
+    while len(blocchi) > 1 and len(blocchi[-2]) <= len(blocchi[-1]):
+        ultimo = blocchi.pop()
+        blocchi[-1] = pd.concat([blocchi[-1], ultimo])
+
+
+def _ultime(blocchi: list, n: int):
+    parti, righe = [], 0
+    for blocco in reversed(blocchi):
+        parti.append(blocco.iloc[-(n - righe):])
+        righe += len(parti[-1])
+        if righe >= n:
+            break
+    return pd.concat(parti[::-1]) if parti else None
+
+
+class MonitorLive:
+    """Dataset che cresce in append, con aggregati e previsioni incrementali."""
+
+    def __init__(self, percorso, model=None, features=None):
+        self.sorgente = SorgenteLive(percorso)
+        self.accumulatore = AccumulatoreStreaming(col_statistiche=COLONNE_VOLUME)
+        self.giornaliero = RollupGiornaliero()
+        self.model = model
+        self.features = list(features) if features is not None else None
+
+        self.n_righe = 0
+        self.ultime_righe = 0
+        self.col_data = None
+        self._righe = []
+        self._previsioni = []
+
+    def aggiorna(self) -> int:
+        """Legge e integra le righe nuove; restituisce quante sono."""
+        nuove = self.sorgente.leggi_nuove()
+        self.ultime_righe = 0 if nuove is None else len(nuove)
+        if not self.ultime_righe:
+            return 0
+
+        if self.col_data is None:
+            self.col_data = nuove.columns[0]
+        tempi = pd.to_datetime(nuove[self.col_data])
+
+        self.accumulatore.aggiorna(nuove)
+        self.giornaliero.aggiorna(tempi, nuove)
+        if self.model is not None and self.features:
+            previsioni = self._prevedi(nuove)
+            _accoda(self._previsioni, pd.Series(previsioni, index=pd.DatetimeIndex(tempi), name='previsione'))
+
+        _accoda(self._righe, nuove)
+        self.n_righe += self.ultime_righe
+        return self.ultime_righe
+
+    def _prevedi(self, nuove: pd.DataFrame) -> np.ndarray:
+        base = nuove
+        profondita = profondita_lag(self.features)
+        if profondita:
+            # Per i lag bastano le ultime `profondita` righe già viste
+            coda = _ultime(self._righe, profondita)
+            if coda is not None:
+                base = pd.concat([coda, nuove], ignore_index=True)
+
+        X = calcola_matrice(base, self.features)[len(base) - len(nuove):]
+        return previsioni_serie(self.model, X, self.features)
+
+    def ultime(self, n: int) -> pd.DataFrame | None:
+        """Ultime `n` righe ricevute (con la colonna 'previsione' se c'è un modello)."""
+        righe = _ultime(self._righe, n)
+        if righe is None:
+            return None
+        righe = righe.reset_index(drop=True)
+        previsioni = _ultime(self._previsioni, n)
+        if previsioni is not None:
+            righe['previsione'] = previsioni.to_numpy()
+        return righe
@@ -0,0 +1,75 @@
+# ==============================================================================
+# REGISTRO LOCALE DEI MODELLI (hash del contenuto + caricamento memory-mapped)
+# ==============================================================================
+# Ogni modello caricato viene salvato una sola volta su disco con il suo hash
+# come nome. La deserializzazione usa `mmap_mode`: gli array NumPy del modello
+# restano mappati sul file invece di essere copiati in memoria, e il modello
+# caricato può essere condiviso da tutte le sessioni del processo.
+import os
+import time
+import warnings
+from functools import lru_cache
+
+import joblib
+
+from core.ingestion import CACHE_DIR, _evict_lru, hash_contenuto
+
+MODELLI_DIR = CACHE_DIR / "modelli"
+# Spazio massimo occupato dal registro prima dell'eviction LRU
+MODELLI_MAX_BYTES = int(os.environ.get("DASHBOARD_MODELLI_MAX_MB", "2048")) * 1024 * 1024
+
+# Avviso di joblib per i file compressi, che non supportano mmap (viene
+# emesso da contextlib, quindi il filtro è sul solo testo del messaggio)
+_AVVISO_MMAP_COMPRESSO = r'mmap_mode ".*" is not compatible with compressed file'
+
+
+def percorso_modello(chiave: str):
+    return MODELLI_DIR / f"{chiave}.joblib"
+
+
+def registra_modello(data: bytes) -> str:
+    """Salva i byte del modello nel registro (se non presenti) e restituisce l'hash."""
+    chiave = hash_contenuto(data)
+    path = percorso_modello(chiave)
+    if path.exists():
+        os.utime(path)  # segna il modello come usato di recente
+        return chiave
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Spazio liberato prima della scrittura: il modello appena registrato
+    # non viene mai rimosso, anche se da solo supera il limite
+    _evict_lru(path.parent, max(0, MODELLI_MAX_BYTES - len(data)), "*.joblib")
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+    return chiave
+
+
+def carica_modello(chiave: str):
+    """Deserializza il modello registrato; restituisce (modello, info)."""
+    path = percorso_modello(chiave)
+    inizio = time.perf_counter()
+    with warnings.catch_warnings():
+        # I file compressi non supportano mmap: joblib li carica normalmente.
+        # Gli altri avvisi (es. InconsistentVersionWarning di sklearn) restano visibili
+        warnings.filterwarnings("ignore", message=_AVVISO_MMAP_COMPRESSO, category=UserWarning)
+        model = joblib.load(path, mmap_mode='r')
+    durata = time.perf_counter() - inizio
+    os.utime(path)
+
+    feature_names = getattr(model, 'feature_names_in_', None)
+    info = {
+        'chiave': chiave,
+        'tempo_caricamento_s': durata,
+        'byte': path.stat().st_size,
+        'feature_names': list(feature_names) if feature_names is not None else None,
+    }
+    return model, info
+
+
+@lru_cache(maxsize=8)
+def modello_condiviso(chiave: str):
+    """Come `carica_modello`, ma deserializzato una sola volta per processo.
+
+    Tutte le pagine e le sessioni ricevono lo stesso oggetto (sola lettura).
+    """
+    return carica_modello(chiave)
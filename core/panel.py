@@ -0,0 +1,154 @@
+# ==============================================================================
+# DATI PANEL (molte serie, es. stazioni, identificate da una colonna ID)
+# ==============================================================================
+# Il dataset viene ordinato una volta per (serie, tempo): ogni serie occupa un
+# intervallo contiguo di righe, trovato per ricerca binaria sui codici. KPI,
+# sensibilità al meteo, statistiche e previsioni vengono calcolati per tutte
+# le serie insieme con groupby / bincount sui codici interi, senza cicli Python
+# sulle serie.
+import numpy as np
+import pandas as pd
+
+from core.features import calcola_matrice
+from core.forecast import previsioni_serie
+from core.weather import COLONNE_METEO, codici_meteo
+
+# Nomi di colonna ID riconosciuti automaticamente
+COLONNE_ID = ['station_id', 'stazione', 'id_stazione', 'station', 'id', 'serie']
+
+# Codice meteo (indice in COLONNE_METEO) da cui si considera "maltempo"
+CODICE_MALTEMPO = 2
+
+
+def trova_colonna_id(df: pd.DataFrame) -> str | None:
+    """Prima colonna di `df` con un nome ID noto (senza distinzione di maiuscole)."""
+    per_nome = {c.lower(): c for c in df.columns}
+    for nome in COLONNE_ID:
+        if nome in per_nome:
+            return per_nome[nome]
+    return None
+
+
+class Panel:
+    """Dataset multi-serie ordinato per (serie, tempo) con i confini di ogni serie."""
+
+    def __init__(self, df: pd.DataFrame, col_id: str, col_data: str | None = None):
+        self.col_id = col_id
+        self.col_data = col_data or df.columns[0]
+        codici, ids = pd.factorize(df[col_id], sort=True)
+        # Le righe senza ID (codice -1) non appartengono a nessuna serie: escluse
+        validi = codici >= 0
+        self.righe_senza_id = int(len(codici) - validi.sum())
+        if self.righe_senza_id:
+            df, codici = df[validi], codici[validi]
+        tempi = pd.to_datetime(df[self.col_data]).to_numpy()
+
+        ordine = np.lexsort((tempi, codici))
+        self.df = df.iloc[ordine].reset_index(drop=True)
+        self.codici = codici[ordine]
+        self.tempi = pd.DatetimeIndex(tempi[ordine])
+        self.ids = ids
+        # Righe [confini[k], confini[k + 1]) della serie k
+        self.confini = np.searchsorted(self.codici, np.arange(len(ids) + 1))
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    @property
+    def n_serie(self) -> int:
+        return len(self.ids)
+
+    def limiti(self, id_serie) -> tuple[int, int]:
+        k = self.ids.get_loc(id_serie)
+        return int(self.confini[k]), int(self.confini[k + 1])
+
+    def serie(self, id_serie) -> pd.DataFrame:
+        i, j = self.limiti(id_serie)
+        return self.df.iloc[i:j]
+
+
+def kpi_giornalieri(panel: Panel) -> pd.DataFrame:
+    """Somme giornaliere di registered/cnt e KPI di efficienza per (serie, giorno).
+
+    Senza la colonna 'registered' il KPI resta NaN.
+    """
+    giorni = panel.tempi.values.astype('datetime64[D]')
+    colonne = [c for c in ('registered', 'cnt') if c in panel.df.columns]
+    tab = panel.df[colonne].groupby([panel.codici, giorni], sort=True).sum()
+    tab.index.names = ['serie', 'Date_Index']
+    if 'registered' in tab.columns:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            tab['kpi_efficiency_rate'] = tab['registered'] / tab['cnt'] * 100
+    else:
+        tab['kpi_efficiency_rate'] = np.nan
+    return tab
+
+
+def riepilogo_serie(panel: Panel, giornaliero: pd.DataFrame | None = None) -> pd.DataFrame:
+    """Una riga per serie: statistiche di cnt, efficienza e sensibilità al meteo."""
+    df = panel.df
+    codici = panel.codici
+    n = panel.n_serie
+    cnt = df['cnt'].to_numpy(dtype=float)
+
+    gruppi = df['cnt'].groupby(codici)
+    out = pd.DataFrame({
+        'righe': np.bincount(codici, minlength=n),
+        'cnt_totale': np.bincount(codici, weights=cnt, minlength=n),
+        'cnt_medio': gruppi.mean().to_numpy(),
+        'cnt_std': gruppi.std().to_numpy(),
+        'cnt_max': gruppi.max().to_numpy(),
+    }, index=pd.Index(panel.ids, name=panel.col_id))
+
+    if 'registered' in df.columns:
+        registrati = np.bincount(codici, weights=df['registered'].to_numpy(dtype=float), minlength=n)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['efficienza'] = registrati / out['cnt_totale'].to_numpy() * 100
+        if giornaliero is None:
+            giornaliero = kpi_giornalieri(panel)
+        kpi = giornaliero['kpi_efficiency_rate'].groupby(level='serie')
+        out['efficienza_ultimo_giorno'] = kpi.last().reindex(range(n)).to_numpy()
+
+    cols_meteo = [c for c in COLONNE_METEO if c in df.columns]
+    if cols_meteo:
+        # Media di cnt con il sole e con pioggia/tempesta, per serie
+        meteo = codici_meteo(df[cols_meteo].to_numpy())
+        media_sole = _media_per_codice(codici, cnt, meteo == 0, n)
+        media_maltempo = _media_per_codice(codici, cnt, meteo >= CODICE_MALTEMPO, n)
+        out['media_sole'] = media_sole
+        out['media_maltempo'] = media_maltempo
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out['calo_meteo_pct'] = np.where(media_sole > 0, (media_sole - media_maltempo) / media_sole * 100, np.nan)
+    return out
+
+
+def _media_per_codice(codici, valori, maschera, n) -> np.ndarray:
+    somme = np.bincount(codici[maschera], weights=valori[maschera], minlength=n)
+    conteggi = np.bincount(codici[maschera], minlength=n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(conteggi > 0, somme / conteggi, np.nan)
+
+
+def previsioni_panel(model, panel: Panel, features) -> np.ndarray:
+    """Previsioni per tutte le righe di tutte le serie in un'unica chiamata batch.
+
+    Le feature mancanti vengono costruite dalla pipeline condivisa, con i lag
+    di cnt calcolati all'interno di ogni serie; le righe senza storico
+    sufficiente restano NaN.
+    """
+    features = list(features)
+    matrice = calcola_matrice(panel.df, features, gruppi=panel.codici)
+    return previsioni_serie(model, matrice, features)
+
+
+def errori_per_serie(panel: Panel, previsioni: np.ndarray) -> pd.DataFrame:
+    """MAE e bias delle previsioni per serie (bincount sui codici)."""
+    errori = previsioni - panel.df['cnt'].to_numpy(dtype=float)
+    valide = ~np.isnan(errori)
+    codici = panel.codici[valide]
+    n = panel.n_serie
+    conteggi = np.bincount(codici, minlength=n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mae = np.bincount(codici, weights=np.abs(errori[valide]), minlength=n) / conteggi
+        bias = np.bincount(codici, weights=errori[valide], minlength=n) / conteggi
+    return pd.DataFrame({'MAE': mae, 'Bias': bias}, index=pd.Index(panel.ids, name=panel.col_id))
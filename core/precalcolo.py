@@ -0,0 +1,172 @@
+# ==============================================================================
+# PRECALCOLO IN BACKGROUND (sezioni della dashboard calcolate in parallelo)
+# ==============================================================================
+# Appena un dataset viene caricato, rollup, tabelle meteo, statistiche delle
+# correlazioni e previsioni partono insieme in un pool di thread condiviso dal
+# processo. Le pagine non aspettano: mostrano subito le sezioni già pronte e
+# un segnaposto per le altre. numpy/pandas rilasciano il GIL nelle parti
+# pesanti, e i thread leggono il frame condiviso senza copiarlo.
+# Una fase fallita resta visibile come 'errore' finché l'utente non chiede
+# di ritentarla: i rerun automatici della pagina non la rimettono in coda.
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import pandas as pd
+
+from core.aggregates import costruisci_cubo
+from core.correlations import calcola_statistiche_correlazione
+from core.store import MAX_DATASET
+from core.timeindex import indicizza_per_data
+from core.weather import COLONNE_METEO, tabella_impatto_meteo
+
+N_WORKER = min(4, os.cpu_count() or 1)
+
+# Nomi delle sezioni precalcolate per la pagina di analisi
+FASI_ANALISI = ['cubo', 'meteo', 'correlazioni']
+
+
+class PrecalcoloDataset:
+    """Risultati calcolati in background per dataset (LRU), indicizzati per fase."""
+
+    def __init__(self, max_workers: int = N_WORKER, max_dataset: int = MAX_DATASET):
+        self.max_dataset = max_dataset
+        self._esecutore = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="precalcolo")
+        self._fasi = OrderedDict()
+        self._secondi = {}
+        self._lock = threading.Lock()
+
+    def _esegui(self, chiave, nome, funzione, args):
+        inizio = time.perf_counter()
+        try:
+            return funzione(*args)
+        finally:
+            with self._lock:
+                # Un dataset già rimosso dalla LRU non lascia durate orfane
+                if chiave in self._fasi:
+                    self._secondi[(chiave, nome)] = time.perf_counter() - inizio
+
+    def avvia(self, chiave: str, nome: str, funzione, *args) -> None:
+        """Mette in coda `funzione(*args)` come fase `nome` del dataset (una volta sola).
+
+        Una fase già avviata, anche se fallita, non viene ripetuta: per
+        ritentarla si usa `ritenta`.
+        """
+        with self._lock:
+            fasi = self._fasi.setdefault(chiave, {})
+            self._fasi.move_to_end(chiave)
+            if nome not in fasi:
+                fasi[nome] = self._esecutore.submit(self._esegui, chiave, nome, funzione, args)
+            while len(self._fasi) > self.max_dataset:
+                vecchia, vecchie = self._fasi.popitem(last=False)
+                for nome_vecchio, future in vecchie.items():
+                    future.cancel()
+                    self._secondi.pop((vecchia, nome_vecchio), None)
+
+    def _future(self, chiave, nome):
+        with self._lock:
+            return self._fasi.get(chiave, {}).get(nome)
+
+    def pronto(self, chiave: str, nome: str) -> bool:
+        """True se la fase è terminata senza errori (il risultato è disponibile)."""
+        future = self._future(chiave, nome)
+        return future is not None and future.done() and not _fallita(future)
+
+    def errore(self, chiave: str, nome: str) -> BaseException | None:
+        """Eccezione della fase se è fallita o è stata annullata, altrimenti None."""
+        future = self._future(chiave, nome)
+        if future is None or not _fallita(future):
+            return None
+        return CancelledError() if future.cancelled() else future.exception()
+
+    def risultato(self, chiave: str, nome: str):
+        """Risultato della fase (attende se non è finita; rilancia l'eventuale errore)."""
+        return self._future(chiave, nome).result()
+
+    def progresso(self, chiave: str, fasi=None) -> tuple[int, int]:
+        """(fasi completate, fasi avviate) del dataset, opzionalmente solo tra `fasi`."""
+        with self._lock:
+            futures = {n: f for n, f in self._fasi.get(chiave, {}).items() if fasi is None or n in fasi}
+        return sum(f.done() for f in futures.values()), len(futures)
+
+    def stato(self, chiave: str) -> pd.DataFrame:
+        """Stato e durata di ogni fase avviata per il dataset."""
+        with self._lock:
+            futures = dict(self._fasi.get(chiave, {}))
+        righe = []
+        for nome, future in futures.items():
+            if not future.done():
+                stato = 'in corso'
+            elif _fallita(future):
+                stato = 'errore'
+            else:
+                stato = 'pronto'
+            righe.append({'fase': nome, 'stato': stato, 'secondi': self._secondi.get((chiave, nome))})
+        return pd.DataFrame(righe, columns=['fase', 'stato', 'secondi'])
+
+    def avviata(self, chiave: str, nome: str) -> bool:
+        return self._future(chiave, nome) is not None
+
+    def ritenta(self, chiave: str, fasi=None) -> list[str]:
+        """Dimentica le fasi fallite del dataset (opzionalmente solo tra `fasi`).
+
+        Il prossimo `avvia` le rimette in coda. Restituisce i nomi delle fasi rimosse.
+        """
+        with self._lock:
+            esistenti = self._fasi.get(chiave, {})
+            rimosse = [n for n, f in esistenti.items() if (fasi is None or n in fasi) and _fallita(f)]
+            for nome in rimosse:
+                del esistenti[nome]
+                self._secondi.pop((chiave, nome), None)
+        return rimosse
+
+
+def _fallita(future) -> bool:
+    return future.done() and (future.cancelled() or future.exception() is not None)
+
+
+def _rilancia(errore: Exception):
+    raise errore
+
+
+def avvia_analisi(chiave: str, df: pd.DataFrame, precalcolo: "PrecalcoloDataset | None" = None) -> None:
+    """Avvia le fasi della pagina di analisi (rollup, meteo, correlazioni) per `df`.
+
+    Nessun effetto sulle fasi già avviate. Se la prima colonna non è una data,
+    rollup e meteo falliscono con l'errore dell'indice e le correlazioni
+    vengono calcolate sul frame così com'è: il caricamento non si interrompe.
+    """
+    precalcolo = precalcolo or PRECALCOLO
+    colonne = set(df.columns[1:])
+    fasi = {}
+    if {'registered', 'cnt'} <= colonne:
+        fasi['cubo'] = costruisci_cubo
+    if colonne & set(COLONNE_METEO):
+        fasi['meteo'] = tabella_impatto_meteo
+    if 'cnt' in colonne:
+        fasi['correlazioni'] = calcola_statistiche_correlazione
+    da_avviare = [nome for nome in fasi if not precalcolo.avviata(chiave, nome)]
+    if not da_avviare:
+        return
+
+    try:
+        df_idx = indicizza_per_data(df)
+    except (ValueError, TypeError) as e:
+        for nome in da_avviare:
+            if nome == 'correlazioni':
+                precalcolo.avvia(chiave, nome, calcola_statistiche_correlazione, df)
+            else:
+                precalcolo.avvia(chiave, nome, _rilancia, e)
+        return
+    for nome in da_avviare:
+        precalcolo.avvia(chiave, nome, fasi[nome], df_idx)
+
+
+def nome_fase_previsioni(chiave_modello: str) -> str:
+    return f"previsioni:{chiave_modello}"
+
+
+# Istanza unica per processo, condivisa tra le sessioni come l'archivio dei dataset
+PRECALCOLO = PrecalcoloDataset()
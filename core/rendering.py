@@ -0,0 +1,147 @@
+# ==============================================================================
+# RENDERING SCALABILE (downsampling lato server + WebGL + box precalcolati)
+# ==============================================================================
+# Il browser riceve al massimo qualche migliaio di punti per grafico:
+# - le serie temporali vengono ridotte con LTTB al budget di pixel visibile
+# - gli scatter densi passano a WebGL e, oltre una soglia, a una heatmap di densità
+# - i box plot arrivano con quartili e baffi già calcolati (niente righe grezze)
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+# Punti per serie: circa due per pixel orizzontale di un grafico a tutta larghezza
+N_PUNTI_LINEA = 2000
+# Oltre questa soglia lo scatter diventa una heatmap di densità
+SOGLIA_DENSITA = 100_000
+# Numero massimo di bin per asse nella heatmap di densità
+MAX_BIN_DENSITA = 60
+
+
+def _come_numerico(valori) -> np.ndarray:
+    arr = np.asarray(valori)
+    if np.issubdtype(arr.dtype, np.datetime64):
+        return arr.astype('datetime64[ns]').view('int64').astype(float)
+    return arr.astype(float)
+
+
+def indici_lttb(x, y, n_out: int = N_PUNTI_LINEA) -> np.ndarray:
+    """Indici dei punti scelti da Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    x = _come_numerico(x)
+    # Il calcolo delle aree ignora NaN/inf (es. KPI con cnt = 0)
+    y = np.nan_to_num(_come_numerico(y), nan=0.0, posinf=0.0, neginf=0.0)
+
+    # n_out - 2 bucket tra il primo e l'ultimo punto (sempre mantenuti)
+    bordi = np.linspace(1, n - 1, n_out - 1).astype(int)
+    out = np.empty(n_out, dtype=int)
+    out[0] = 0
+    out[-1] = n - 1
+
+    a = 0
+    for i in range(n_out - 2):
+        inizio, fine = bordi[i], bordi[i + 1]
+        succ_fine = bordi[i + 2] if i + 2 < len(bordi) else n
+        media_x = x[fine:succ_fine].mean()
+        media_y = y[fine:succ_fine].mean()
+
+        aree = np.abs(
+            (x[a] - media_x) * (y[inizio:fine] - y[a])
+            - (x[a] - x[inizio:fine]) * (media_y - y[a])
+        )
+        a = inizio + int(np.argmax(aree))
+        out[i + 1] = a
+    return out
+
+
+def riduci_serie(x, y, n_punti: int = N_PUNTI_LINEA) -> tuple[np.ndarray, np.ndarray]:
+    """Serie (x, y) ridotta a `n_punti` preservandone la forma visiva."""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    idx = indici_lttb(x, y, n_punti)
+    return x[idx], y[idx]
+
+
+def figura_scatter(df: pd.DataFrame, x: str, y: str, title: str) -> go.Figure:
+    """Scatter WebGL, o heatmap di densità calcolata lato server se i punti sono troppi."""
+    if len(df) <= SOGLIA_DENSITA:
+        return px.scatter(df, x=x, y=y, color=y, opacity=0.4, title=title, render_mode='webgl')
+
+    return figura_densita(densita_scatter(df[x], df[y]), x, y, title)
+
+
+def densita_scatter(vx, vy) -> dict:
+    """Istogramma 2D (centri dei bin e conteggi) di una nuvola di punti."""
+    vx = np.asarray(vx, dtype=float)
+    vy = np.asarray(vy, dtype=float)
+    validi = np.isfinite(vx) & np.isfinite(vy)
+    vx, vy = vx[validi], vy[validi]
+
+    # Variabili discrete (es. 'hr', 'season') hanno un bin per valore
+    bin_x = int(min(pd.unique(vx).size, MAX_BIN_DENSITA))
+    conteggi, bordi_x, bordi_y = np.histogram2d(vx, vy, bins=[max(bin_x, 1), MAX_BIN_DENSITA])
+    return {
+        'x': (bordi_x[:-1] + bordi_x[1:]) / 2,
+        'y': (bordi_y[:-1] + bordi_y[1:]) / 2,
+        'conteggi': conteggi,
+        'n': len(vx),
+    }
+
+
+def figura_densita(densita: dict, x: str, y: str, title: str) -> go.Figure:
+    """Heatmap da un istogramma 2D già calcolato."""
+    fig = go.Figure(go.Heatmap(
+        x=densita['x'],
+        y=densita['y'],
+        z=densita['conteggi'].T,
+        colorscale='Viridis',
+        colorbar=dict(title='Righe')
+    ))
+    fig.update_layout(title=f"{title} (densità, {densita['n']:,} punti)", xaxis_title=x, yaxis_title=y)
+    return fig
+
+
+def statistiche_box(df: pd.DataFrame, x, y: str) -> pd.DataFrame:
+    """Quartili e baffi (1.5 IQR, come Plotly) di `y` per ogni valore di `x`.
+
+    `x` può essere anche una lista di colonne (indice risultante a più livelli).
+    """
+    gruppi = df.groupby(x, sort=True)[y]
+    stats = gruppi.quantile([0.25, 0.5, 0.75]).unstack()
+    stats.columns = ['q1', 'median', 'q3']
+
+    chiavi = pd.MultiIndex.from_frame(df[x]) if isinstance(x, list) else pd.Index(df[x])
+    iqr = stats['q3'] - stats['q1']
+    limite_basso = (stats['q1'] - 1.5 * iqr).reindex(chiavi).to_numpy()
+    limite_alto = (stats['q3'] + 1.5 * iqr).reindex(chiavi).to_numpy()
+
+    # I baffi arrivano al dato più estremo ancora dentro i limiti
+    valori = df[y].to_numpy(dtype=float)
+    dentro = (valori >= limite_basso) & (valori <= limite_alto)
+    interni = pd.Series(valori[dentro], index=chiavi[dentro])
+    livelli = list(range(chiavi.nlevels))
+    stats['lowerfence'] = interni.groupby(level=livelli).min()
+    stats['upperfence'] = interni.groupby(level=livelli).max()
+    stats['mean'] = gruppi.mean()
+    stats['count'] = gruppi.size()
+    return stats
+
+
+def figura_box(stats: pd.DataFrame, x: str, title: str) -> go.Figure:
+    """Box plot costruito da statistiche già calcolate (nessun punto grezzo inviato)."""
+    fig = go.Figure(go.Box(
+        x=stats.index,
+        q1=stats['q1'],
+        median=stats['median'],
+        q3=stats['q3'],
+        lowerfence=stats['lowerfence'],
+        upperfence=stats['upperfence'],
+        mean=stats['mean'],
+        boxpoints=False,
+        name=x
+    ))
+    fig.update_layout(title=title, xaxis_title=x, showlegend=False)
+    return fig
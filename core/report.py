@@ -0,0 +1,230 @@
+# ==============================================================================
+# REPORT BATCH HEADLESS (molti CSV in parallelo, senza Streamlit)
+# ==============================================================================
+# Calcola per ogni CSV gli stessi risultati della pagina di analisi (KPI,
+# cubo ora/giorno/settimana/mese/anno dell'efficienza, tabelle di sensibilità al meteo,
+# statistiche delle correlazioni per variabile e filtro) e, se forniti, le
+# previsioni dei modelli.
+# I risultati vengono salvati come artefatti Parquet/JSON compatti che la
+# dashboard apre direttamente; i CSV passano da una cartella di snapshot
+# propria, separata da quella della dashboard.
+#
+# Uso: python -m core.report <cartella_csv> <cartella_output> [--modello m.joblib ...]
+import argparse
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from core.aggregates import COLONNE_VOLUME, LIVELLI, costruisci_cubo
+from core.correlations import calcola_statistiche_correlazione, da_formato_lungo, in_formato_lungo
+from core.features import calcola_matrice, feature_mancanti
+from core.forecast import previsioni_serie
+from core.ingestion import CACHE_DIR, carica_csv
+from core.models import carica_modello, registra_modello
+from core.timeindex import indicizza_per_data
+from core.weather import tabella_impatto_meteo
+
+DIMENSIONE_CAMPIONE = 5_000
+# Snapshot Parquet dei CSV del batch: non riempiono la cache della dashboard
+REPORT_SNAPSHOT_DIR = CACHE_DIR / "report_snapshot"
+
+
+# Statistiche di una colonna assente, come per l'accumulatore streaming
+STATISTICHE_VUOTE = {'count': 0, 'mean': np.nan, 'std': np.nan, 'min': np.nan, 'max': np.nan}
+
+
+def _statistiche(serie: pd.Series) -> dict:
+    return {
+        'count': int(serie.count()),
+        'mean': float(serie.mean()),
+        'std': float(serie.std()),
+        'min': float(serie.min()),
+        'max': float(serie.max()),
+    }
+
+
+def calcola_report(df: pd.DataFrame, modelli: dict | None = None) -> dict:
+    """Risultati della pagina di analisi per un dataset (più previsioni opzionali).
+
+    `modelli` è un dizionario nome -> modello già caricato.
+    Restituisce un dizionario di DataFrame più la voce 'riepilogo' (JSON).
+    """
+    df_idx = indicizza_per_data(df)
+    cols_volume = [c for c in COLONNE_VOLUME if c in df_idx.columns]
+
+    cubo = costruisci_cubo(df_idx)
+    giornaliero = cubo['day']
+
+    riepilogo = {
+        'n_righe': len(df),
+        'colonne': df.columns.tolist(),
+        'inizio': str(df_idx.index.min()),
+        'fine': str(df_idx.index.max()),
+        'statistiche': {c: _statistiche(df_idx[c]) for c in cols_volume},
+    }
+    if 'kpi_efficiency_rate' in giornaliero.columns and len(giornaliero):
+        riepilogo['efficienza_media'] = float(giornaliero['kpi_efficiency_rate'].mean())
+        riepilogo['efficienza_ultimo_giorno'] = float(giornaliero['kpi_efficiency_rate'].iloc[-1])
+
+    risultati = {
+        'riepilogo': riepilogo,
+        # Tutti i livelli del cubo con il KPI: la dashboard non riaggrega
+        **{f"cubo_{livello}": tab for livello, tab in cubo.items()},
+        'meteo': tabella_impatto_meteo(df_idx),
+        'correlazioni': in_formato_lungo(calcola_statistiche_correlazione(df_idx)) if 'cnt' in df_idx.columns
+        else pd.DataFrame(),
+        'campione': df.sample(min(len(df), DIMENSIONE_CAMPIONE), random_state=0).sort_index(),
+    }
+
+    previsioni = {}
+    for nome, modello in (modelli or {}).items():
+        features = getattr(modello, 'feature_names_in_', None)
+        if features is None or feature_mancanti(df_idx, features):
+            continue
+        matrice = calcola_matrice(df_idx, features)
+        previsioni[nome] = previsioni_serie(modello, matrice, features).astype(np.float32)
+    riepilogo['modelli'] = list(previsioni)
+    if previsioni and 'cnt' in df_idx.columns:
+        # Errore orario per modello e totali giornalieri reale/previsto:
+        # la dashboard non deve rileggere le previsioni riga per riga
+        orarie_prev = pd.DataFrame(previsioni, index=df_idx.index)
+        errori = orarie_prev.sub(df_idx['cnt'].astype(float), axis=0).abs()
+        riepilogo['mae_modelli'] = {nome: float(errori[nome].mean()) for nome in previsioni}
+        giorni = orarie_prev.groupby(df_idx.index.floor('D')).sum(min_count=1)
+        giorni.insert(0, 'cnt', giornaliero['cnt'].reindex(giorni.index).to_numpy())
+        risultati['previsioni'] = giorni.astype(np.float32)
+    return risultati
+
+
+def salva_report(risultati: dict, cartella: Path) -> None:
+    cartella.mkdir(parents=True, exist_ok=True)
+    for nome, valore in risultati.items():
+        if nome == 'riepilogo':
+            (cartella / "riepilogo.json").write_text(json.dumps(valore, indent=2))
+        else:
+            # Colonne non stringa (es. 'valore' misto) restano compatibili con Parquet
+            valore.to_parquet(cartella / f"{nome}.parquet", index=True)
+
+
+def elabora_file(percorso: Path, cartella_output: Path, chiavi_modelli: dict) -> dict:
+    """Elabora un CSV e salva i suoi artefatti in `cartella_output/<nome file>`."""
+    inizio = time.perf_counter()
+    _, df = carica_csv(percorso.read_bytes(), cartella=REPORT_SNAPSHOT_DIR)
+    modelli = {nome: carica_modello(chiave)[0] for nome, chiave in chiavi_modelli.items()}
+
+    risultati = calcola_report(df, modelli)
+    risultati['riepilogo'].update({
+        'file': percorso.name,
+        'creato': datetime.now(timezone.utc).isoformat(),
+    })
+    salva_report(risultati, cartella_output / percorso.stem)
+    return {'file': percorso.name, 'righe': len(df), 'secondi': time.perf_counter() - inizio, 'errore': None}
+
+
+def _esito_fallito(percorso: Path, errore: Exception) -> dict:
+    return {'file': percorso.name, 'righe': 0, 'secondi': np.nan, 'errore': f"{type(errore).__name__}: {errore}"}
+
+
+def elabora_cartella(cartella_input: Path, cartella_output: Path, percorsi_modelli=(),
+                     max_workers: int | None = None) -> list[dict]:
+    """Elabora tutti i CSV di `cartella_input` in parallelo (un processo per file).
+
+    Un file che fallisce non interrompe gli altri: il suo esito riporta
+    l'errore nella voce 'errore' (None per i file elaborati).
+    """
+    files = sorted(Path(cartella_input).glob("*.csv"))
+    # I modelli entrano nel registro una volta: i worker li caricano memory-mapped
+    chiavi_modelli = {Path(p).stem: registra_modello(Path(p).read_bytes()) for p in percorsi_modelli}
+
+    esiti = []
+    if max_workers == 1:
+        for f in files:
+            try:
+                esiti.append(elabora_file(f, Path(cartella_output), chiavi_modelli))
+            except Exception as e:
+                esiti.append(_esito_fallito(f, e))
+        return esiti
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {f: pool.submit(elabora_file, f, Path(cartella_output), chiavi_modelli) for f in files}
+        for f, future in futures.items():
+            try:
+                esiti.append(future.result())
+            except Exception as e:
+                esiti.append(_esito_fallito(f, e))
+    return esiti
+
+
+class ReportPrecalcolato:
+    """Artefatti di un report letti da disco, con la stessa interfaccia
+    dell'accumulatore streaming usata dalla pagina di analisi."""
+
+    def __init__(self, cartella):
+        cartella = Path(cartella)
+        self.riepilogo = json.loads((cartella / "riepilogo.json").read_text())
+        self.n_righe = self.riepilogo['n_righe']
+        self.colonne = self.riepilogo['colonne']
+        self._cubo = {livello: pd.read_parquet(cartella / f"cubo_{livello}.parquet") for livello in LIVELLI}
+        self._meteo = pd.read_parquet(cartella / "meteo.parquet")
+        self._campione = pd.read_parquet(cartella / "campione.parquet")
+        self._correlazioni = pd.read_parquet(cartella / "correlazioni.parquet")
+        path_previsioni = cartella / "previsioni.parquet"
+        self._previsioni = pd.read_parquet(path_previsioni) if path_previsioni.exists() else None
+
+    def statistiche(self, col: str = 'cnt') -> dict:
+        """Statistiche di `col`; count 0 e NaN se la colonna non era nel CSV."""
+        if col not in self.riepilogo['statistiche']:
+            return dict(STATISTICHE_VUOTE)
+        return self.riepilogo['statistiche'][col]
+
+    def somme_orarie(self) -> pd.DataFrame:
+        return self._cubo['hour'][[c for c in COLONNE_VOLUME if c in self._cubo['hour'].columns]]
+
+    def cubo(self) -> dict[str, pd.DataFrame]:
+        """Cubo multi-risoluzione (con KPI Efficienza) salvato dal report."""
+        return self._cubo
+
+    def tabella_meteo(self) -> pd.DataFrame:
+        return self._meteo
+
+    def campione(self) -> pd.DataFrame:
+        return self._campione
+
+    def statistiche_correlazione(self) -> dict:
+        """Statistiche box per (variabile, filtro) calcolate su tutte le righe."""
+        return da_formato_lungo(self._correlazioni)
+
+    def previsioni(self) -> pd.DataFrame | None:
+        """Totali giornalieri reale ('cnt') e previsti per modello, None se assenti."""
+        return self._previsioni
+
+    def errori_modelli(self) -> dict:
+        """MAE orario di ogni modello sulle righe del CSV."""
+        return self.riepilogo.get('mae_modelli', {})
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Report batch della dashboard su una cartella di CSV.")
+    parser.add_argument("input", type=Path, help="Cartella con i CSV da elaborare")
+    parser.add_argument("output", type=Path, help="Cartella degli artefatti (una sottocartella per CSV)")
+    parser.add_argument("--modello", action="append", default=[], help="Modello .joblib (ripetibile)")
+    parser.add_argument("--workers", type=int, default=None, help="Processi paralleli (default: CPU)")
+    args = parser.parse_args()
+
+    esiti = elabora_cartella(args.input, args.output, args.modello, args.workers)
+    for r in esiti:
+        if r['errore']:
+            print(f"{r['file']:<40} ERRORE: {r['errore']}")
+        else:
+            print(f"{r['file']:<40} {r['righe']:>12,} righe  {r['secondi']:>8.2f} s")
+    falliti = sum(1 for r in esiti if r['errore'])
+    if falliti:
+        raise SystemExit(f"{falliti} file su {len(esiti)} non elaborati.")
+
+
+if __name__ == "__main__":
+    main()
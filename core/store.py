@@ -0,0 +1,106 @@
+# ==============================================================================
+# ARCHIVIO CONDIVISO DEI DATASET (una copia compattata per processo)
+# ==============================================================================
+# Ogni dataset caricato viene compattato (dtype ridotti) e tenuto una sola
+# volta per processo, indicizzato per hash del contenuto: tutte le sessioni
+# che caricano lo stesso file ricevono lo stesso DataFrame. Le pagine lo
+# trattano in sola lettura e lavorano su viste o colonne derivate.
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Colonne continue che non richiedono la precisione float64
+COLONNE_FLOAT32 = ['temp', 'atemp', 'hum', 'windspeed']
+# Colonne di volume: restano almeno int32 perché vengono sommate su anni di dati
+COLONNE_VOLUME_INT32 = ['cnt', 'registered', 'casual']
+
+MAX_DATASET = 8
+# Una sessione senza rerun da più di così non conta più come utente attivo
+TIMEOUT_SESSIONE_S = 30 * 60
+
+
+def compatta_dtypes(df: pd.DataFrame) -> pd.DataFrame:
+    """Copia del frame con dtype ridotti (flag -> int8, continue -> float32, interi piccoli)."""
+    out = {}
+    for col in df.columns:
+        serie = df[col]
+        if col in COLONNE_FLOAT32 and pd.api.types.is_float_dtype(serie):
+            out[col] = serie.astype(np.float32)
+        elif pd.api.types.is_integer_dtype(serie) and not pd.api.types.is_bool_dtype(serie):
+            # One-hot 'weathersit_*', 'workingday' -> int8; 'hr', 'season' -> int8/int16
+            ridotta = pd.to_numeric(serie, downcast='integer')
+            if col in COLONNE_VOLUME_INT32:
+                ridotta = ridotta.astype(np.promote_types(ridotta.dtype, np.int32))
+            out[col] = ridotta
+        elif pd.api.types.is_float_dtype(serie) and col.startswith('weathersit_'):
+            # One-hot salvati come float (es. dopo un concat con NaN riempiti)
+            if serie.isin([0.0, 1.0]).all():
+                out[col] = serie.astype(np.int8)
+            else:
+                out[col] = serie
+        else:
+            out[col] = serie
+    return pd.DataFrame(out, index=df.index)
+
+
+class ArchivioDataset:
+    """Dataset condivisi tra sessioni, indicizzati per hash del contenuto (LRU)."""
+
+    def __init__(self, max_dataset: int = MAX_DATASET):
+        self.max_dataset = max_dataset
+        self._frames = OrderedDict()
+        self._sessioni = {}
+        self._lock = threading.Lock()
+
+    def registra(self, chiave: str, df: pd.DataFrame) -> pd.DataFrame:
+        """Restituisce il frame condiviso per `chiave`, compattando `df` se è nuovo."""
+        with self._lock:
+            if chiave in self._frames:
+                self._frames.move_to_end(chiave)
+                return self._frames[chiave]
+
+        compatto = compatta_dtypes(df)
+        with self._lock:
+            # Un'altra sessione potrebbe averlo registrato nel frattempo
+            compatto = self._frames.setdefault(chiave, compatto)
+            self._frames.move_to_end(chiave)
+            while len(self._frames) > self.max_dataset:
+                vecchia, _ = self._frames.popitem(last=False)
+                self._sessioni.pop(vecchia, None)
+        return compatto
+
+    def get(self, chiave: str) -> pd.DataFrame | None:
+        with self._lock:
+            return self._frames.get(chiave)
+
+    def segna_sessione(self, chiave: str, id_sessione: str) -> None:
+        """Registra che `id_sessione` sta usando il dataset `chiave`."""
+        with self._lock:
+            if chiave in self._frames:
+                self._sessioni.setdefault(chiave, {})[id_sessione] = time.monotonic()
+
+    def rapporto_memoria(self) -> dict:
+        """Memoria dei dataset condivisi e stima per utente attivo."""
+        limite = time.monotonic() - TIMEOUT_SESSIONE_S
+        with self._lock:
+            byte_dataset = {k: int(df.memory_usage(deep=True).sum()) for k, df in self._frames.items()}
+            attive_per_dataset = {
+                k: {i for i, t in s.items() if t >= limite}
+                for k, s in self._sessioni.items()
+            }
+
+        totale = sum(byte_dataset.values())
+        n_sessioni = len(set().union(*attive_per_dataset.values()))
+        return {
+            'byte_totali': totale,
+            'byte_per_dataset': byte_dataset,
+            'sessioni_per_dataset': {k: len(s) for k, s in attive_per_dataset.items()},
+            'sessioni_attive': n_sessioni,
+            'byte_per_utente': totale / n_sessioni if n_sessioni else totale,
+        }
+
+# Istanza unica per processo: i moduli importati restano vivi tra i rerun
+ARCHIVIO = ArchivioDataset()
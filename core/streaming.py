@@ -0,0 +1,188 @@
+# ==============================================================================
+# INGESTIONE OUT-OF-CORE A CHUNK CON ACCUMULATORI IN UN SOLO PASSAGGIO
+# ==============================================================================
+# Per file più grandi della RAM: il CSV viene letto a blocchi e ogni blocco
+# aggiorna accumulatori di dimensione costante (media/varianza di Welford,
+# min/max, somme orarie, medie per anno x meteo) più un campione casuale
+# limitato per le anteprime. Del file restano in memoria solo gli aggregati.
+import numpy as np
+import pandas as pd
+
+from core.aggregates import COLONNE_VOLUME, costruisci_cubo
+from core.ingestion import converti_date
+from core.weather import COLONNE_METEO, ETICHETTE_METEO, codici_meteo
+
+RIGHE_PER_CHUNK = 200_000
+DIMENSIONE_CAMPIONE = 5_000
+# Numero di parziali accumulati prima di ricompattarli in un'unica tabella
+MAX_PARZIALI = 32
+
+
+def _compatta(parziali: list[pd.DataFrame]) -> list[pd.DataFrame]:
+    if len(parziali) <= 1:
+        return parziali
+    return [pd.concat(parziali).groupby(level=list(range(parziali[0].index.nlevels))).sum()]
+
+
+class AccumulatoreStreaming:
+    """Statistiche di un dataset aggiornate chunk per chunk con memoria costante."""
+
+    def __init__(self, col_statistiche=('cnt',), dimensione_campione: int = DIMENSIONE_CAMPIONE, seed: int = 0):
+        self.col_statistiche = list(col_statistiche)
+        self.dimensione_campione = dimensione_campione
+        self.rng = np.random.default_rng(seed)
+
+        self.n_righe = 0
+        self.colonne = None
+        self.col_data = None
+
+        # Welford / Chan: conteggio, media, somma dei quadrati degli scarti
+        self._n = {c: 0 for c in self.col_statistiche}
+        self._media = {c: 0.0 for c in self.col_statistiche}
+        self._m2 = {c: 0.0 for c in self.col_statistiche}
+        self._min = {c: np.inf for c in self.col_statistiche}
+        self._max = {c: -np.inf for c in self.col_statistiche}
+
+        self._orarie = []
+        self._meteo_somme = []
+        self._campione = None
+        self._chiavi_campione = np.empty(0)
+
+    # --- AGGIORNAMENTO ---
+    def aggiorna(self, chunk: pd.DataFrame) -> None:
+        if self.colonne is None:
+            self.colonne = chunk.columns.tolist()
+            self.col_data = self.colonne[0]
+
+        tempi = pd.to_datetime(chunk[self.col_data])
+        self.n_righe += len(chunk)
+
+        self._aggiorna_statistiche(chunk)
+        self._aggiorna_orarie(chunk, tempi)
+        self._aggiorna_meteo(chunk, tempi)
+        self._aggiorna_campione(chunk)
+
+    def _aggiorna_statistiche(self, chunk: pd.DataFrame) -> None:
+        for c in self.col_statistiche:
+            if c not in chunk.columns:
+                continue
+            valori = chunk[c].to_numpy(dtype=float)
+            valori = valori[~np.isnan(valori)]
+            n_b = len(valori)
+            if n_b == 0:
+                continue
+
+            media_b = valori.mean()
+            m2_b = ((valori - media_b) ** 2).sum()
+
+            # Unione dei momenti del blocco con quelli accumulati (Chan et al.)
+            n_a = self._n[c]
+            n = n_a + n_b
+            delta = media_b - self._media[c]
+            self._media[c] += delta * n_b / n
+            self._m2[c] += m2_b + delta ** 2 * n_a * n_b / n
+            self._n[c] = n
+
+            self._min[c] = min(self._min[c], valori.min())
+            self._max[c] = max(self._max[c], valori.max())
+
+    def _aggiorna_orarie(self, chunk: pd.DataFrame, tempi: pd.Series) -> None:
+        cols = [c for c in COLONNE_VOLUME if c in chunk.columns]
+        if not cols:
+            return
+        ore = tempi.to_numpy().astype('datetime64[h]')
+        parziale = chunk[cols].groupby(ore).sum()
+        parziale.index = pd.DatetimeIndex(parziale.index)
+
+        self._orarie.append(parziale)
+        if len(self._orarie) > MAX_PARZIALI:
+            self._orarie = _compatta(self._orarie)
+
+    def _aggiorna_meteo(self, chunk: pd.DataFrame, tempi: pd.Series) -> None:
+        cols_meteo = [c for c in COLONNE_METEO if c in chunk.columns]
+        cols = [c for c in COLONNE_VOLUME if c in chunk.columns]
+        if not cols_meteo or not cols:
+            return
+        etichette = np.array([ETICHETTE_METEO[c] for c in cols_meteo])
+        chiavi = [tempi.dt.year.to_numpy(), etichette[codici_meteo(chunk[cols_meteo])]]
+
+        parziale = chunk[cols].groupby(chiavi).sum()
+        parziale['_n'] = chunk.groupby(chiavi).size()
+        parziale.index.names = ['Year', 'Meteo_Label']
+        self._meteo_somme.append(parziale)
+        if len(self._meteo_somme) > MAX_PARZIALI:
+            self._meteo_somme = _compatta(self._meteo_somme)
+
+    def _aggiorna_campione(self, chunk: pd.DataFrame) -> None:
+        # Reservoir con chiavi casuali: teniamo le righe con le k chiavi più piccole
+        k = self.dimensione_campione
+        chiavi_nuove = self.rng.random(len(chunk))
+        tutte = np.concatenate([self._chiavi_campione, chiavi_nuove])
+        if len(tutte) <= k:
+            scelte = np.arange(len(tutte))
+        else:
+            scelte = np.argpartition(tutte, k - 1)[:k]
+
+        n_vecchie = len(self._chiavi_campione)
+        vecchie = scelte[scelte < n_vecchie]
+        nuove = scelte[scelte >= n_vecchie] - n_vecchie
+        parti = [chunk.iloc[nuove]]
+        if self._campione is not None:
+            parti.insert(0, self._campione.iloc[vecchie])
+
+        self._campione = pd.concat(parti, ignore_index=True)
+        self._chiavi_campione = np.concatenate([self._chiavi_campione[vecchie], chiavi_nuove[nuove]])
+
+    # --- RISULTATI ---
+    def statistiche(self, col: str = 'cnt') -> dict:
+        n = self._n.get(col, 0)
+        return {
+            'count': n,
+            'mean': self._media[col] if n else np.nan,
+            'std': np.sqrt(self._m2[col] / (n - 1)) if n > 1 else np.nan,
+            'min': self._min[col] if n else np.nan,
+            'max': self._max[col] if n else np.nan,
+        }
+
+    def somme_orarie(self) -> pd.DataFrame:
+        self._orarie = _compatta(self._orarie)
+        if not self._orarie:
+            return pd.DataFrame(index=pd.DatetimeIndex([], name='Date_Index'))
+        return self._orarie[0].sort_index()
+
+    def cubo(self) -> dict[str, pd.DataFrame]:
+        """Stesso cubo multi-risoluzione di `costruisci_cubo`, dalle somme orarie."""
+        return costruisci_cubo(self.somme_orarie())
+
+    def tabella_meteo(self) -> pd.DataFrame:
+        """Medie per (Year, Meteo_Label) di ogni colonna di volume, più il conteggio 'n'."""
+        self._meteo_somme = _compatta(self._meteo_somme)
+        if not self._meteo_somme:
+            return pd.DataFrame(columns=['Year', 'Meteo_Label'])
+        # La tabella compattata resta lo stato dell'accumulatore: non va modificata
+        somme = self._meteo_somme[0]
+        conteggi = somme['_n']
+        medie = somme.drop(columns='_n').div(conteggi, axis=0)
+        medie['n'] = conteggi
+        return medie.sort_index().reset_index()
+
+    def campione(self) -> pd.DataFrame:
+        if self._campione is None:
+            return pd.DataFrame(columns=self.colonne or [])
+        return self._campione.sort_values(self.col_data, kind='stable').reset_index(drop=True)
+
+
+def accumula_csv(sorgente, righe_per_chunk: int = RIGHE_PER_CHUNK, **kwargs) -> AccumulatoreStreaming:
+    """Legge `sorgente` (percorso o file) a chunk e restituisce l'accumulatore finale.
+
+    Ogni chunk passa dalla stessa conversione delle date del caricamento in
+    memoria (il CSV grezzo riceve il timestamp orario in prima colonna); un
+    file la cui prima colonna non è una data viene rifiutato.
+    """
+    acc = AccumulatoreStreaming(**kwargs)
+    for chunk in pd.read_csv(sorgente, chunksize=righe_per_chunk):
+        chunk = converti_date(chunk)
+        if not pd.api.types.is_datetime64_any_dtype(chunk.iloc[:, 0]):
+            raise ValueError(f"La prima colonna ('{chunk.columns[0]}') non è una data.")
+        acc.aggiorna(chunk)
+    return acc
@@ -0,0 +1,96 @@
+# ==============================================================================
+# SERIE INDICIZZATA NEL TEMPO (ordinamento unico + ricerca binaria)
+# ==============================================================================
+# I dati vengono ordinati una sola volta sulla colonna data; finestre e punti
+# si trovano poi con `searchsorted` (O(log n)) invece di maschere booleane su
+# tutto il dataset o confronti tra stringhe.
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# Serie ordinate tenute in memoria per processo (una per dataset e colonna data)
+MAX_SERIE = 4
+
+
+class SerieIndicizzata:
+    """DataFrame ordinato per tempo con slicing e lookup per ricerca binaria."""
+
+    def __init__(self, df: pd.DataFrame, col_data: str):
+        tempi = pd.DatetimeIndex(pd.to_datetime(df[col_data]))
+        if not tempi.is_monotonic_increasing:
+            ordine = np.argsort(tempi.values, kind='stable')
+            df = df.iloc[ordine]
+            tempi = tempi[ordine]
+
+        self.col_data = col_data
+        self.df = df.reset_index(drop=True)
+        self.tempi = tempi
+
+    def __len__(self) -> int:
+        return len(self.tempi)
+
+    @property
+    def inizio(self) -> pd.Timestamp:
+        return self.tempi[0]
+
+    @property
+    def fine(self) -> pd.Timestamp:
+        return self.tempi[-1]
+
+    def limiti(self, start, end) -> tuple[int, int]:
+        """Posizioni [i, j) delle righe con start <= tempo < end."""
+        i = self.tempi.searchsorted(pd.Timestamp(start), side='left')
+        j = self.tempi.searchsorted(pd.Timestamp(end), side='left')
+        return int(i), int(j)
+
+    def finestra(self, start, end) -> pd.DataFrame:
+        i, j = self.limiti(start, end)
+        return self.df.iloc[i:j]
+
+    def posizione(self, istante) -> int | None:
+        """Posizione esatta di `istante`, None se non presente."""
+        istante = pd.Timestamp(istante)
+        i = int(self.tempi.searchsorted(istante, side='left'))
+        if i < len(self.tempi) and self.tempi[i] == istante:
+            return i
+        return None
+
+
+
+_SERIE = OrderedDict()
+_LOCK_SERIE = threading.Lock()
+
+
+def serie_condivisa(chiave_df: str, col_data: str, df: pd.DataFrame) -> SerieIndicizzata:
+    """`SerieIndicizzata` di `df` ordinata una sola volta per processo (LRU).
+
+    Tutte le pagine e le sessioni che usano lo stesso dataset ricevono lo
+    stesso oggetto, da trattare in sola lettura.
+    """
+    chiave = (chiave_df, col_data)
+    with _LOCK_SERIE:
+        if chiave in _SERIE:
+            _SERIE.move_to_end(chiave)
+            return _SERIE[chiave]
+
+    serie = SerieIndicizzata(df, col_data)
+    with _LOCK_SERIE:
+        serie = _SERIE.setdefault(chiave, serie)
+        _SERIE.move_to_end(chiave)
+        while len(_SERIE) > MAX_SERIE:
+            _SERIE.popitem(last=False)
+    return serie
+
+
+def indicizza_per_data(df: pd.DataFrame) -> pd.DataFrame:
+    """Vista di `df` con la prima colonna come DatetimeIndex ('Date_Index').
+
+    La prima colonna viene rimossa dai dati; il frame di partenza (che può
+    essere condiviso tra sessioni) non viene modificato.
+    """
+    indice = pd.DatetimeIndex(pd.to_datetime(df.iloc[:, 0]), name='Date_Index')
+    out = df.iloc[:, 1:]
+    out.index = indice
+    return out
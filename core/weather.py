@@ -0,0 +1,62 @@
+# ==============================================================================
+# CONDIZIONI METEO (colonne One-Hot 'weathersit_*')
+# ==============================================================================
+import numpy as np
+import pandas as pd
+
+# Colonne Meteo One-Hot (in ordine di bontà)
+COLONNE_METEO = ['weathersit_1.0', 'weathersit_2.0', 'weathersit_3.0', 'weathersit_4.0']
+
+ETICHETTE_METEO = {
+    'weathersit_1.0': '1. Sole/Sereno',
+    'weathersit_2.0': '2. Nuvoloso',
+    'weathersit_3.0': '3. Pioggia Leggera',
+    'weathersit_4.0': '4. Tempesta'
+}
+
+
+def codici_meteo(blocco_ohe) -> np.ndarray:
+    """Indice della colonna attiva per ogni riga del blocco One-Hot (argmax NumPy)."""
+    return np.asarray(blocco_ohe).argmax(axis=1)
+
+
+# --- MOTORE IMPATTO METEO ---
+# Colonne target analizzabili (selettore "tipologia di utenza")
+COLONNE_TARGET = ['cnt', 'registered', 'casual']
+
+
+def tabella_impatto_meteo(df: pd.DataFrame, colonne_target=COLONNE_TARGET) -> pd.DataFrame:
+    """Media e conteggio per (Year, Meteo_Label) di tutte le colonne target.
+
+    `df` deve avere un DatetimeIndex. Le condizioni meteo vengono ricavate
+    una volta sola con argmax sul blocco One-Hot e il raggruppamento copre
+    tutti gli anni e tutte le colonne target in un unico passaggio.
+    Restituisce colonne Year, Meteo_Label, <target...>, n.
+    """
+    cols_meteo = [c for c in COLONNE_METEO if c in df.columns]
+    targets = [c for c in colonne_target if c in df.columns]
+    if not cols_meteo or not targets:
+        return pd.DataFrame(columns=['Year', 'Meteo_Label', *targets, 'n'])
+
+    codici = codici_meteo(df[cols_meteo].to_numpy())
+    anni = df.index.year.to_numpy()
+
+    # Chiavi intere (niente stringhe per riga): le etichette si applicano al risultato
+    gruppi = df[targets].groupby([anni, codici], sort=True)
+    tabella = gruppi.mean()
+    tabella['n'] = gruppi.size()
+    tabella.index.names = ['Year', 'Meteo_Label']
+    tabella = tabella.reset_index()
+
+    etichette = np.array([ETICHETTE_METEO[c] for c in cols_meteo])
+    tabella['Meteo_Label'] = etichette[tabella['Meteo_Label'].to_numpy()]
+    return tabella
+
+
+def sensibilita_meteo(tabella: pd.DataFrame, col: str, anno: int,
+                      da=ETICHETTE_METEO['weathersit_1.0'], a=ETICHETTE_METEO['weathersit_4.0']):
+    """(media con `da`, media con `a`) per `col` nell'anno scelto; None se mancano dati."""
+    righe = tabella[tabella['Year'] == anno].set_index('Meteo_Label')[col]
+    if da not in righe.index or a not in righe.index:
+        return None
+    return righe[da], righe[a]
@@ -1,45 +1,193 @@
+import os
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
+from plotly.colors import hex_to_rgb, qualitative
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from core.aggregates import ETICHETTE_LIVELLI, LIVELLI, costruisci_cubo
+from core.correlations import FILTRI_WORKINGDAY, OPZIONI_ANALISI, calcola_statistiche_correlazione
+from core.ingestion import carica_csv
+from core.instrumentation import TRACCIA_MEMORIA, Strumentazione
+from core.precalcolo import FASI_ANALISI, PRECALCOLO, avvia_analisi
+from core.report import ReportPrecalcolato
+from core.rendering import figura_box, figura_densita, figura_scatter, riduci_serie
+from core.store import ARCHIVIO
+from core.streaming import accumula_csv
+from core.timeindex import indicizza_per_data
+from core.weather import COLONNE_METEO, sensibilita_meteo
 
 # Configurazione pagina
 st.set_page_config(page_title="Analisi Serie Storica", layout="wide")
 
+# Ogni quanto la pagina controlla le sezioni calcolate in background
+INTERVALLO_AGGIORNAMENTO_S = 0.5
+
+
+@st.cache_data(show_spinner=False)
+def cubo_aggregati(chiave_df, _df):
+    # Chiave = hash del file: il cubo viene costruito una sola volta per dataset
+    return costruisci_cubo(_df)
+
+
+@st.cache_data(show_spinner=False)
+def statistiche_correlazione(chiave_df, _df):
+    # Tutte le combinazioni variabile x filtro workingday in un solo calcolo:
+    # selectbox e radio leggono solo il dizionario
+    return calcola_statistiche_correlazione(_df)
+
+
+@st.fragment(run_every=INTERVALLO_AGGIORNAMENTO_S)
+def avanzamento_precalcolo(chiave_df, completate_al_render):
+    # Rieseguito da solo finché il calcolo in background non termina
+    completate, totale = PRECALCOLO.progresso(chiave_df, FASI_ANALISI)
+    if completate > completate_al_render:
+        # Una nuova sezione è pronta: rerun completo, le sezioni finite si leggono dalla memoria
+        st.rerun()
+    st.progress(completate / max(totale, 1), text=f"⏳ Analisi in background: {completate}/{totale} sezioni pronte")
+    stato = PRECALCOLO.stato(chiave_df)
+    st.caption(" · ".join(f"{r.fase}: {r.stato}" for r in stato.itertuples()))
+
+
+def errore_fase(chiave_df, nome, descrizione) -> bool:
+    # Errore della fase con un pulsante per ritentarla: solo su richiesta,
+    # i rerun automatici non ripetono un calcolo che fallisce
+    errore = PRECALCOLO.errore(chiave_df, nome)
+    if errore is None:
+        return False
+    st.error(f"Calcolo {descrizione} non riuscito: {errore!r}")
+    if st.button("🔄 Riprova", key=f"riprova_{nome}"):
+        PRECALCOLO.ritenta(chiave_df, [nome])
+        st.rerun()
+    return True
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def riepilogo_streaming(percorso, dimensione, mtime):
+    # Dimensione e mtime nella chiave: se il file cambia viene riletto
+    return accumula_csv(percorso)
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def report_precalcolato(cartella, mtime):
+    # mtime del riepilogo nella chiave: un report rigenerato viene riletto
+    return ReportPrecalcolato(cartella)
+
+
 # Titolo
 st.title("📊 Analisi Serie Storica & KPI Business")
 
+# --- STRUMENTAZIONE (tempo / memoria / righe per sezione, log JSON) ---
+debug_perf = st.sidebar.toggle("🐞 Pannello performance", key="toggle_debug_perf")
+pannello_perf = st.sidebar.empty()
+
+
+def mostra_misure(sezioni):
+    pannello_perf.dataframe(pd.DataFrame(sezioni).set_index('sezione'))
+
+
+perf = Strumentazione(
+    "1AnalisiDati",
+    traccia_memoria=debug_perf or TRACCIA_MEMORIA,
+    al_termine=mostra_misure if debug_perf else None
+)
+
 st.sidebar.header("1. Carica i Dati (CSV)")
 uploaded_file = st.sidebar.file_uploader("File dati storici (CSV)", type=["csv"])
 
 # --- CARICAMENTO DATI ---
 if uploaded_file:
     try:
-        df = pd.read_csv(uploaded_file)
-        
-        # Conversione data se esiste colonna 'dteday' (comune in questi dataset)
-        if 'dteday' in df.columns:
-            df['dteday'] = pd.to_datetime(df['dteday'])
-            
-        st.session_state['df_condiviso'] = df
+        # Il parsing avviene solo quando cambia il file: i rerun (click su radio,
+        # selectbox, ...) riusano il DataFrame già in sessione.
+        if st.session_state.get('file_id_caricato') != uploaded_file.file_id:
+            # Lo stesso contenuto ricaricato viene letto dallo snapshot Parquet
+            with perf.sezione('caricamento_csv') as misura:
+                chiave_df, df = carica_csv(uploaded_file.getvalue())
+                # Una sola copia compattata per processo, condivisa tra le sessioni
+                df = ARCHIVIO.registra(chiave_df, df)
+                misura['righe'] = len(df)
+            # Rollup, meteo e correlazioni partono subito, in parallelo
+            avvia_analisi(chiave_df, df)
+
+            st.session_state['df_condiviso'] = df
+            st.session_state['df_hash'] = chiave_df
+            st.session_state['file_id_caricato'] = uploaded_file.file_id
         st.sidebar.success("Dati caricati correttamente!")
     except Exception as e:
         st.sidebar.error(f"Errore nel caricamento: {e}")
 
+# --- MODALITÀ STREAMING (file più grandi della RAM) ---
+# Il CSV viene letto dal disco del server a blocchi: in memoria restano solo
+# gli aggregati e un campione casuale per anteprime e correlazioni.
+st.sidebar.header("Oppure: CSV locale molto grande")
+riepilogo = None
+if st.sidebar.toggle("Modalità streaming (lettura a blocchi)", key="toggle_streaming"):
+    percorso_csv = st.sidebar.text_input("Percorso del CSV sul server", key="percorso_streaming")
+    if percorso_csv:
+        try:
+            info_file = os.stat(percorso_csv)
+            with perf.sezione('lettura_streaming'):
+                with st.spinner("Lettura a blocchi in corso..."):
+                    riepilogo = riepilogo_streaming(percorso_csv, info_file.st_size, info_file.st_mtime)
+            chiave_riepilogo = f"stream:{percorso_csv}:{info_file.st_size}:{info_file.st_mtime}"
+            st.sidebar.success(f"File elaborato in streaming: {riepilogo.n_righe} righe.")
+        except Exception as e:
+            st.sidebar.error(f"Errore nella lettura a blocchi: {e}")
+
+# --- REPORT PRECALCOLATO (python -m core.report) ---
+# Gli artefatti del report batch si aprono senza rileggere il CSV originale
+if riepilogo is None and st.sidebar.toggle("Apri report precalcolato", key="toggle_report"):
+    cartella_report = st.sidebar.text_input("Cartella del report sul server", key="cartella_report")
+    if cartella_report:
+        try:
+            mtime_report = os.stat(os.path.join(cartella_report, "riepilogo.json")).st_mtime
+            with perf.sezione('lettura_report'):
+                riepilogo = report_precalcolato(cartella_report, mtime_report)
+            chiave_riepilogo = f"report:{cartella_report}:{mtime_report}"
+            st.sidebar.success(f"Report caricato: {riepilogo.n_righe} righe.")
+        except Exception as e:
+            st.sidebar.error(f"Errore nella lettura del report: {e}")
+
 # --- ANALISI ---
-if 'df_condiviso' in st.session_state:
-    df = st.session_state['df_condiviso']
+if riepilogo is not None or 'df_condiviso' in st.session_state:
+    if riepilogo is not None:
+        # Il "df" è il campione: statistiche e aggregati arrivano dagli accumulatori
+        df = riepilogo.campione()
+        n_righe = riepilogo.n_righe
+        stats_cnt = riepilogo.statistiche('cnt')
+    else:
+        df = st.session_state['df_condiviso']
+        n_righe = len(df)
+        stats_cnt = None
+        chiave_df = st.session_state.get('df_hash', str(id(df)))
+        # Nessun effetto se le fasi sono già avviate (anche se fallite)
+        avvia_analisi(chiave_df, df)
+
+        if 'df_hash' in st.session_state:
+            ctx = get_script_run_ctx()
+            if ctx is not None:
+                ARCHIVIO.segna_sessione(st.session_state['df_hash'], ctx.session_id)
+            memoria = ARCHIVIO.rapporto_memoria()
+            with st.sidebar.expander("💾 Memoria condivisa"):
+                st.write(f"**Dataset in memoria:** {len(memoria['byte_per_dataset'])} "
+                         f"({memoria['byte_totali'] / 1024**2:.1f} MB)")
+                st.write(f"**Sessioni attive:** {memoria['sessioni_attive']}")
+                st.write(f"**Memoria per utente:** {memoria['byte_per_utente'] / 1024**2:.1f} MB")
     
     # ---------------------------------------------------------
     # SEZIONE 1: PANORAMICA (Tuo codice originale)
     # ---------------------------------------------------------
-    st.write(f"Dataset caricato: {len(df)} righe.")
+    st.write(f"Dataset caricato: {n_righe} righe.")
+    if riepilogo is not None:
+        st.caption(f"Modalità streaming/report: anteprime e correlazioni su un campione casuale di {len(df)} righe.")
     
     with st.expander("Visualizza Anteprima Dati e Statistiche Base", expanded=False):
         col1, col2 = st.columns(2)
         with col1:
-            st.write(f"**Righe:** {len(df)}")
+            st.write(f"**Righe:** {n_righe}")
             st.write(f"**Colonne:** {len(df.columns)}")
         with col2:
             st.write("**Colonne disponibili:**", df.columns.tolist())
@@ -47,14 +195,31 @@ if 'df_condiviso' in st.session_state:
         st.dataframe(df.head())
 
         # Statistiche rapide
-        c1, c2, c3, c4 = st.columns(4)
-        c1.metric("Media Totale (cnt)", f"{df['cnt'].mean():.0f}")
-        c2.metric("Min", f"{df['cnt'].min()}")
-        c3.metric("Max", f"{df['cnt'].max()}")
-        c4.metric("Std Dev", f"{df['cnt'].std():.0f}")
+        with perf.sezione('statistiche_panoramica', righe=len(df)):
+            if stats_cnt is None:
+                stats_cnt = {
+                    'mean': df['cnt'].mean(),
+                    'min': df['cnt'].min(),
+                    'max': df['cnt'].max(),
+                    'std': df['cnt'].std()
+                }
+        if stats_cnt.get('count', 1) == 0:
+            st.warning("Colonna 'cnt' non presente: statistiche non disponibili.")
+        else:
+            c1, c2, c3, c4 = st.columns(4)
+            c1.metric("Media Totale (cnt)", f"{stats_cnt['mean']:.0f}")
+            c2.metric("Min", f"{stats_cnt['min']:.0f}")
+            c3.metric("Max", f"{stats_cnt['max']:.0f}")
+            c4.metric("Std Dev", f"{stats_cnt['std']:.0f}")
 
     st.markdown("---")
 
+    # Le sezioni seguenti compaiono man mano che il calcolo in background le completa
+    if riepilogo is None:
+        completate, totale = PRECALCOLO.progresso(chiave_df, FASI_ANALISI)
+        if completate < totale:
+            avanzamento_precalcolo(chiave_df, completate)
+
     # ---------------------------------------------------------
     # SEZIONE 2: KPI & SUPPORTO DECISIONI (Index Date + OHE)
     # ---------------------------------------------------------
@@ -65,75 +230,97 @@ if 'df_condiviso' in st.session_state:
     col_registered = 'registered' 
     col_total = 'cnt'
     # Colonne Meteo One-Hot (in ordine di bontà)
-    cols_meteo_ohe = ['weathersit_1.0', 'weathersit_2.0', 'weathersit_3.0', 'weathersit_4.0']
+    cols_meteo_ohe = COLONNE_METEO
 
     if col_registered in df.columns and col_total in df.columns:
         
        # --- 0. PREPARAZIONE INDICE (CORRETTO) ---
         # Ci assicuriamo che l'indice sia datetime.
+        # Il frame in sessione è condiviso tra utenti: lavoriamo su una vista
+        # senza modificarne l'indice.
         try:
-            # 1. Impostiamo la prima colonna come indice (datetime)
-            df.index = pd.to_datetime(df.iloc[:, 0])
-            
-            # 2. Rinominiamo l'indice per evitare nomi generici come "Unnamed: 0"
-            df.index.name = 'Date_Index'
-            
-            # 3. RIMUOVIAMO la prima colonna dai dati per evitare duplicati/ambiguità
-            #    (Selezioniamo tutte le righe e tutte le colonne dalla seconda in poi)
-            df = df.iloc[:, 1:] 
+            # Prima colonna come indice (datetime, "Date_Index") e rimossa dai dati:
+            # vista sulle colonne successive, nessuna copia
+            with perf.sezione('indice_datetime', righe=len(df)):
+                df = indicizza_per_data(df)
             
         except Exception as e:
             st.error(f"Errore nella gestione dell'indice: {e}")
 
-        # --- 1. AGGREGAZIONE GIORNALIERA (Tramite Indice appena settato) ---
-        # Raggruppiamo sommando i volumi usando la data dell'indice
-        # df.index.date prende solo la parte "YYYY-MM-DD" ignorando l'ora
-        df_daily = df.groupby(df.index.date)[[col_registered, col_total]].sum()
-        
-        # Riconvertiamo l'indice del nuovo df_daily in datetime per sicurezza (per Plotly)
-        df_daily.index = pd.to_datetime(df_daily.index)
-        
-        # Calcolo KPI Efficienza sui dati GIORNALIERI
-        df_daily['kpi_efficiency_rate'] = (df_daily[col_registered] / df_daily[col_total]) * 100
+        # --- 1. AGGREGAZIONE (Cubo multi-risoluzione, calcolato una volta per dataset) ---
+        # Rollup ora/giorno/settimana/mese/anno con KPI Efficienza già calcolato:
+        # i rerun leggono dal cubo invece di riaggregare le righe grezze
+        with perf.sezione('cubo_aggregati', righe=n_righe):
+            if isinstance(riepilogo, ReportPrecalcolato):
+                # Il report contiene già tutti i livelli con il KPI
+                cubo = riepilogo.cubo()
+            elif riepilogo is not None:
+                cubo = cubo_aggregati(chiave_riepilogo, riepilogo.somme_orarie())
+            elif PRECALCOLO.pronto(chiave_df, 'cubo'):
+                cubo = PRECALCOLO.risultato(chiave_df, 'cubo')
+            else:
+                cubo = None
+
+        if cubo is None:
+            if riepilogo is not None or not errore_fase(chiave_df, 'cubo', "delle aggregazioni"):
+                st.info("⏳ Aggregazioni e KPI in calcolo...")
+        else:
+            df_daily = cubo['day']
         
-        st.success(f"✅ Dati aggregati per giorno usando la prima colonna come data ({len(df_daily)} giorni trovati).")
+            st.success(f"✅ Dati aggregati per giorno usando la prima colonna come data ({len(df_daily)} giorni trovati).")
 
-        # --- 2. KPI CARDS ---
-        kpi_avg = df_daily['kpi_efficiency_rate'].mean()
-        kpi_last = df_daily['kpi_efficiency_rate'].iloc[-1]
+            # --- 2. KPI CARDS ---
+            kpi_avg = df_daily['kpi_efficiency_rate'].mean()
+            kpi_last = df_daily['kpi_efficiency_rate'].iloc[-1]
         
-        k1, k2 = st.columns(2)
-        k1.metric("Efficienza Media Giornaliera", f"{kpi_avg:.1f}%")
-        k2.metric("Efficienza Ultimo Giorno", f"{kpi_last:.1f}%", delta=f"{kpi_last - kpi_avg:.1f}%")
+            k1, k2 = st.columns(2)
+            k1.metric("Efficienza Media Giornaliera", f"{kpi_avg:.1f}%")
+            k2.metric("Efficienza Ultimo Giorno", f"{kpi_last:.1f}%", delta=f"{kpi_last - kpi_avg:.1f}%")
 
-        # --- 3. GRAFICO MONITORAGGIO TEMPORALE ---
-        st.subheader("📈 Trend Giornaliero: % Registrati")
+            # --- 3. GRAFICO MONITORAGGIO TEMPORALE ---
+            st.subheader("📈 Trend: % Registrati")
+
+            livello_trend = st.radio(
+                "Granularità del trend:",
+                LIVELLI,
+                index=LIVELLI.index('day'),
+                format_func=ETICHETTE_LIVELLI.get,
+                horizontal=True,
+                key="radio_livello_trend"
+            )
+            with perf.sezione('grafico_trend') as misura:
+                df_trend = cubo[livello_trend]
+                misura['righe'] = len(df_trend)
+                # Downsampling LTTB: al browser arrivano al massimo ~2000 punti
+                x_trend, y_trend = riduci_serie(df_trend.index, df_trend['kpi_efficiency_rate'])
         
-        fig_kpi_time = go.Figure()
+                fig_kpi_time = go.Figure()
         
-        fig_kpi_time.add_trace(go.Scatter(
-            x=df_daily.index,  # Usiamo l'indice (le date) come asse X
-            y=df_daily['kpi_efficiency_rate'],
-            mode='lines', 
-            name='% Registrati', 
-            line=dict(color='#00CC96', width=2)
-        ))
+                fig_kpi_time.add_trace(go.Scatter(
+                    x=x_trend,  # Usiamo l'indice (le date) come asse X
+                    y=y_trend,
+                    mode='lines', 
+                    name='% Registrati', 
+                    line=dict(color='#00CC96', width=2)
+                ))
         
-        fig_kpi_time.add_hline(y=kpi_avg, line_dash="dot", annotation_text="Media", line_color="red")
+                # Media sullo stesso livello del cubo mostrato nel grafico
+                media_trend = df_trend['kpi_efficiency_rate'].mean()
+                fig_kpi_time.add_hline(y=media_trend, line_dash="dot", annotation_text="Media", line_color="red")
         
-        fig_kpi_time.update_layout(
-            title="Andamento Efficienza Business (Aggregato per Giorno)", 
-            template="plotly_white", 
-            yaxis_title="% Registrati",
-            hovermode="x unified"
-        )
-        st.plotly_chart(fig_kpi_time, use_container_width=True)
+                fig_kpi_time.update_layout(
+                    title=f"Andamento Efficienza Business (Aggregato per {ETICHETTE_LIVELLI[livello_trend]})", 
+                    template="plotly_white", 
+                    yaxis_title="% Registrati",
+                    hovermode="x unified"
+                )
+                st.plotly_chart(fig_kpi_time, use_container_width=True)
 
                 # --- 4. GESTIONE METEO (COMBO CHART + INSIGHT INTERATTIVO) ---
         cols_esistenti = [c for c in cols_meteo_ohe if c in df.columns]
         
         if len(cols_esistenti) > 0:
-            st.subheader("🌤️ Impatto Meteo: Analisi Trend 2011 vs 2012")
+            st.subheader("🌤️ Impatto Meteo: Analisi Trend per Anno")
             
             # --- SELETTORE METRICA ---
             scelta_utente = st.radio(
@@ -153,116 +340,97 @@ if 'df_condiviso' in st.session_state:
             if col_analizzata not in df.columns:
                 st.error(f"La colonna '{col_analizzata}' non è presente nel dataset.")
             else:
-                # Preparazione Dati
-                df_meteo = df.copy()
-                df_meteo['Year'] = df_meteo.index.year
-                df_meteo['Meteo_Raw'] = df_meteo[cols_esistenti].idxmax(axis=1)
-                
-                mapping_nomi = {
-                    'weathersit_1.0': '1. Sole/Sereno',
-                    'weathersit_2.0': '2. Nuvoloso',
-                    'weathersit_3.0': '3. Pioggia Leggera',
-                    'weathersit_4.0': '4. Tempesta'
-                }
-                df_meteo['Meteo_Label'] = df_meteo['Meteo_Raw'].map(mapping_nomi)
-                
-                # Raggruppamento
-                df_weather_comp = df_meteo.groupby(['Year', 'Meteo_Label'])[col_analizzata].mean().reset_index()
+                with perf.sezione('impatto_meteo', righe=n_righe):
+                    if riepilogo is not None:
+                        # Medie per anno x meteo già accumulate durante la lettura a blocchi
+                        df_weather_comp = riepilogo.tabella_meteo()
+                    elif PRECALCOLO.pronto(chiave_df, 'meteo'):
+                        # Tabella anno x meteo per tutte le colonne target, calcolata una volta per dataset
+                        df_weather_comp = PRECALCOLO.risultato(chiave_df, 'meteo')
+                    else:
+                        df_weather_comp = None
                 
-                df_2011 = df_weather_comp[df_weather_comp['Year'] == 2011]
-                df_2012 = df_weather_comp[df_weather_comp['Year'] == 2012]
-
-                # --- COSTRUZIONE COMBO CHART ---
-                fig_weather = go.Figure()
-
-                # 2011: Barre + Linea
-                fig_weather.add_trace(go.Bar(
-                    x=df_2011['Meteo_Label'],
-                    y=df_2011[col_analizzata],
-                    name='2011 (Volume)',
-                    marker_color='rgba(99, 110, 250, 0.5)', # Blu semi-trasparente
-                    text=df_2011[col_analizzata].apply(lambda x: f"{x:.0f}"),
-                    textposition='auto'
-                ))
-                fig_weather.add_trace(go.Scatter(
-                    x=df_2011['Meteo_Label'],
-                    y=df_2011[col_analizzata],
-                    name='2011 (Trend)',
-                    mode='lines+markers',
-                    marker=dict(symbol='circle', size=8, color='#636EFA'),
-                    line=dict(width=3, color='#636EFA')
-                ))
+                if df_weather_comp is None:
+                    if riepilogo is not None or not errore_fase(chiave_df, 'meteo', "dell'impatto meteo"):
+                        st.info("⏳ Impatto meteo in calcolo...")
+                else:
+                    anni_disponibili = sorted(df_weather_comp['Year'].unique().tolist())
 
-                # 2012: Barre + Linea
-                fig_weather.add_trace(go.Bar(
-                    x=df_2012['Meteo_Label'],
-                    y=df_2012[col_analizzata],
-                    name='2012 (Volume)',
-                    marker_color='rgba(239, 85, 59, 0.5)', # Rosso semi-trasparente
-                    text=df_2012[col_analizzata].apply(lambda x: f"{x:.0f}"),
-                    textposition='auto'
-                ))
-                fig_weather.add_trace(go.Scatter(
-                    x=df_2012['Meteo_Label'],
-                    y=df_2012[col_analizzata],
-                    name='2012 (Trend)',
-                    mode='lines+markers',
-                    marker=dict(symbol='circle', size=8, color='#EF553B'),
-                    line=dict(width=3, color='#EF553B')
-                ))
+                    # --- COSTRUZIONE COMBO CHART ---
+                    with perf.sezione('grafico_meteo', righe=len(df_weather_comp)):
+                        fig_weather = go.Figure()
+                        colori = qualitative.Plotly
 
-                fig_weather.update_layout(
-                    title=f"Analisi Trend Meteo: {scelta_utente}",
-                    xaxis_title="Condizione Meteo",
-                    yaxis_title=f"Media {scelta_utente}",
-                    barmode='group',
-                    template="plotly_white",
-                    legend=dict(title="Anno/Tipo"),
-                    hovermode="x unified"
-                )
-                
-                st.plotly_chart(fig_weather, use_container_width=True)
-                
-                # --- INSIGHT INTERATTIVO ---
-                st.markdown("#### 📉 Calcolo della Sensibilità al Meteo")
+                        # Per ogni anno: Barre + Linea
+                        for i, anno in enumerate(anni_disponibili):
+                            df_anno = df_weather_comp[df_weather_comp['Year'] == anno]
+                            colore = colori[i % len(colori)]
+                            r, g, b = hex_to_rgb(colore)
+
+                            fig_weather.add_trace(go.Bar(
+                                x=df_anno['Meteo_Label'],
+                                y=df_anno[col_analizzata],
+                                name=f'{anno} (Volume)',
+                                marker_color=f'rgba({r}, {g}, {b}, 0.5)', # Semi-trasparente
+                                text=[f"{x:.0f}" for x in df_anno[col_analizzata]],
+                                textposition='auto'
+                            ))
+                            fig_weather.add_trace(go.Scatter(
+                                x=df_anno['Meteo_Label'],
+                                y=df_anno[col_analizzata],
+                                name=f'{anno} (Trend)',
+                                mode='lines+markers',
+                                marker=dict(symbol='circle', size=8, color=colore),
+                                line=dict(width=3, color=colore)
+                            ))
+
+                        fig_weather.update_layout(
+                            title=f"Analisi Trend Meteo: {scelta_utente}",
+                            xaxis_title="Condizione Meteo",
+                            yaxis_title=f"Media {scelta_utente}",
+                            barmode='group',
+                            template="plotly_white",
+                            legend=dict(title="Anno/Tipo"),
+                            hovermode="x unified"
+                        )
                 
-                # Selettore specifico per l'insight
-                anno_insight = st.radio(
-                    "Di quale anno vuoi calcolare il crollo della domanda (Sole vs Pioggia)?",
-                    [2011, 2012],
-                    horizontal=True,
-                    key="radio_insight_year"
-                )
+                        st.plotly_chart(fig_weather, use_container_width=True)
                 
-                # Selezioniamo il dataframe dell'anno scelto
-                df_target = df_2011 if anno_insight == 2011 else df_2012
+                    # --- INSIGHT INTERATTIVO ---
+                    st.markdown("#### 📉 Calcolo della Sensibilità al Meteo")
                 
-                if not df_target.empty:
-                    # Cerchiamo i valori specifici usando string matching parziale ('1.' per Sole, '3.' per Pioggia)
-                    val_sole = df_target[df_target['Meteo_Label'].str.contains('1.')][col_analizzata].values
-                    val_pioggia = df_target[df_target['Meteo_Label'].str.contains('4.')][col_analizzata].values
+                    if anni_disponibili:
+                        # Selettore specifico per l'insight
+                        anno_insight = st.radio(
+                            "Di quale anno vuoi calcolare il crollo della domanda (Sole vs Pioggia)?",
+                            anni_disponibili,
+                            horizontal=True,
+                            key="radio_insight_year"
+                        )
+                    
+                        # Sole vs Tempesta letti dalla tabella già calcolata
+                        confronto = sensibilita_meteo(df_weather_comp, col_analizzata, anno_insight)
                     
-                    if len(val_sole) > 0 and len(val_pioggia) > 0:
-                        val_s = val_sole[0]
-                        val_p = val_pioggia[0]
+                        if confronto is not None:
+                            val_s, val_p = confronto
                         
-                        if val_s > 0:
-                            calo = ((val_s - val_p) / val_s) * 100
+                            if val_s > 0:
+                                calo = ((val_s - val_p) / val_s) * 100
                             
-                            # Creiamo un messaggio dinamico
-                            st.info(f"""
-                            💡 **Insight {anno_insight}:** Nel **{anno_insight}**, passando da condizioni ottimali (Sole) a tempesta, 
-                            la domanda di **{scelta_utente}** crolla del **{calo:.1f}%**.
+                                # Creiamo un messaggio dinamico
+                                st.info(f"""
+                                💡 **Insight {anno_insight}:** Nel **{anno_insight}**, passando da condizioni ottimali (Sole) a tempesta, 
+                                la domanda di **{scelta_utente}** crolla del **{calo:.1f}%**.
                             
-                            * Media con Sole: **{val_s:.0f}**
-                            * Media con Pioggia: **{val_p:.0f}**
-                            """)
+                                * Media con Sole: **{val_s:.0f}**
+                                * Media con Pioggia: **{val_p:.0f}**
+                                """)
+                            else:
+                                st.warning("Il valore medio con il Sole è 0, impossibile calcolare la percentuale.")
                         else:
-                            st.warning("Il valore medio con il Sole è 0, impossibile calcolare la percentuale.")
+                            st.warning(f"Dati insufficienti nel {anno_insight} per confrontare Sole vs Pioggia.")
                     else:
-                        st.warning(f"Dati insufficienti nel {anno_insight} per confrontare Sole vs Pioggia.")
-                else:
-                    st.warning("Nessun dato disponibile per l'anno selezionato.")
+                        st.warning("Nessun dato disponibile per l'anno selezionato.")
 
         else:
             st.info("Nessuna colonna meteo trovata.")
@@ -274,41 +442,85 @@ if 'df_condiviso' in st.session_state:
     st.subheader("🔎 Analisi Approfondita (Filtri & Correlazioni)")
     
     # ... (Il resto del tuo codice originale per scatter e box plot)
-    col_workday = 'workingday'
-    if col_workday in df.columns:
-        filtro_tipo = st.radio(
-            "Filtra i dati per giorni lavorativi:",
-            options=["Tutti i dati", "Giorni Lavorativi (1)", "Non Lavorativi (0)"],
-            horizontal=True,
-            key="filtro_workday" # Aggiunto key per evitare conflitti
-        )
-        if filtro_tipo == "Giorni Lavorativi (1)":
-            df_filtrato = df[df[col_workday] == 1]
-        elif filtro_tipo == "Non Lavorativi (0)":
-            df_filtrato = df[df[col_workday] == 0]
+    # Statistiche di tutte le variabili per tutti i filtri, calcolate una volta per dataset
+    with perf.sezione('statistiche_correlazione', righe=len(df)):
+        if isinstance(riepilogo, ReportPrecalcolato):
+            # Il report le ha già calcolate su tutte le righe, non solo sul campione
+            stats_correlazione = riepilogo.statistiche_correlazione()
+        elif riepilogo is not None:
+            stats_correlazione = statistiche_correlazione(chiave_riepilogo, df)
+        elif PRECALCOLO.pronto(chiave_df, 'correlazioni'):
+            stats_correlazione = PRECALCOLO.risultato(chiave_df, 'correlazioni')
         else:
-            df_filtrato = df
+            stats_correlazione = None
+
+    if stats_correlazione is None:
+        if riepilogo is not None or not errore_fase(chiave_df, 'correlazioni', "delle correlazioni"):
+            st.info("⏳ Statistiche delle correlazioni in calcolo...")
     else:
-        df_filtrato = df
+        col_workday = 'workingday'
+        filtro_tipo = "Tutti i dati"
+        if col_workday in df.columns:
+            filtro_tipo = st.radio(
+                "Filtra i dati per giorni lavorativi:",
+                options=list(FILTRI_WORKINGDAY),
+                horizontal=True,
+                key="filtro_workday" # Aggiunto key per evitare conflitti
+            )
 
-    opzioni_analisi = ['hr', 'season', 'temp', 'hum', 'windspeed']
-    opzioni_disponibili = [col for col in opzioni_analisi if col in df.columns]
+        opzioni_disponibili = [col for col in OPZIONI_ANALISI if col in df.columns]
 
-    if opzioni_disponibili:
-        variabile_x = st.selectbox("Scegli variabile X:", opzioni_disponibili, key="var_select")
+        if opzioni_disponibili:
+            variabile_x = st.selectbox("Scegli variabile X:", opzioni_disponibili, key="var_select")
+            voce = stats_correlazione[(variabile_x, filtro_tipo)]
+            stats_box = voce['box']
         
-        tab1, tab2 = st.tabs(["🔴 Scatter con Media", "📦 Box Plot"])
+            tab1, tab2 = st.tabs(["🔴 Scatter con Media", "📦 Box Plot"])
         
-        with tab1:
-            df_media = df_filtrato.groupby(variabile_x)['cnt'].mean().reset_index().sort_values(by=variabile_x)
-            fig_scatter = px.scatter(df_filtrato, x=variabile_x, y="cnt", color="cnt", opacity=0.4, title=f"Scatter: {variabile_x} vs cnt")
-            fig_scatter.add_scatter(x=df_media[variabile_x], y=df_media['cnt'], mode='markers', name='Media', marker=dict(color='red', size=10, symbol='diamond'))
-            st.plotly_chart(fig_scatter, use_container_width=True)
+            with tab1:
+                with perf.sezione('correlazioni_scatter', righe=int(stats_box['count'].sum())) as misura:
+                    titolo_scatter = f"Scatter: {variabile_x} vs cnt"
+                    if voce['densita'] is not None:
+                        # Dataset grande: heatmap di densità già calcolata
+                        fig_scatter = figura_densita(voce['densita'], variabile_x, "cnt", title=titolo_scatter)
+                    else:
+                        # Pochi punti: scatter WebGL sulle righe filtrate
+                        valore_filtro = FILTRI_WORKINGDAY[filtro_tipo]
+                        df_filtrato = df if valore_filtro is None else df[df[col_workday] == valore_filtro]
+                        fig_scatter = figura_scatter(df_filtrato, variabile_x, "cnt", title=titolo_scatter)
+                        misura['righe'] = len(df_filtrato)
+                    fig_scatter.add_scatter(x=stats_box.index, y=stats_box['mean'], mode='markers', name='Media', marker=dict(color='red', size=10, symbol='diamond'))
+                    st.plotly_chart(fig_scatter, use_container_width=True)
             
-        with tab2:
-            fig_box = px.box(df_filtrato, x=variabile_x, y="cnt", color=variabile_x, title=f"Box Plot: {variabile_x}")
-            fig_box.update_layout(showlegend=False)
-            st.plotly_chart(fig_box, use_container_width=True)
+            with tab2:
+                # Quartili e baffi già calcolati: le righe grezze non vengono inviate
+                with perf.sezione('correlazioni_box', righe=len(stats_box)):
+                    fig_box = figura_box(stats_box, variabile_x, title=f"Box Plot: {variabile_x}")
+                    st.plotly_chart(fig_box, use_container_width=True)
+
+    # ---------------------------------------------------------
+    # SEZIONE 4: PREVISIONI DEI MODELLI (solo report precalcolato)
+    # ---------------------------------------------------------
+    previsioni = riepilogo.previsioni() if isinstance(riepilogo, ReportPrecalcolato) else None
+    errori = riepilogo.errori_modelli() if previsioni is not None else {}
+    if errori:
+        st.markdown("---")
+        st.subheader("🔮 Previsioni dei Modelli (Report)")
+        cols_mae = st.columns(len(errori))
+        for col_mae, (nome_modello, mae) in zip(cols_mae, errori.items()):
+            col_mae.metric(f"MAE orario – {nome_modello}", f"{mae:.1f}")
+
+        with perf.sezione('previsioni_report', righe=len(previsioni)):
+            fig_prev = go.Figure()
+            x_r, y_r = riduci_serie(previsioni.index, previsioni['cnt'])
+            fig_prev.add_trace(go.Scattergl(x=x_r, y=y_r, mode='lines', name='Reale',
+                                            line=dict(color='black', width=1)))
+            for nome_modello in errori:
+                x_p, y_p = riduci_serie(previsioni.index, previsioni[nome_modello])
+                fig_prev.add_trace(go.Scattergl(x=x_p, y=y_p, mode='lines', name=nome_modello))
+            fig_prev.update_layout(title="Noleggi giornalieri: reale vs previsto",
+                                   xaxis_title="Data", yaxis_title="cnt", hovermode="x unified")
+            st.plotly_chart(fig_prev, use_container_width=True)
 
 else:
     st.info("👈 Carica un file CSV dalla barra laterale per iniziare.")
\ No newline at end of file
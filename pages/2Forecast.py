@@ -1,13 +1,64 @@
 import streamlit as st
 import pandas as pd
-import joblib
+import numpy as np
 import plotly.graph_objects as go
 
+from core.features import feature_mancanti, frame_feature, matrice_feature
+from core.forecast import previsione_ricorsiva, previsioni_serie
+from core.instrumentation import TRACCIA_MEMORIA, Strumentazione
+from core.lags import profondita_lag
+from core.models import modello_condiviso, registra_modello
+from core.precalcolo import PRECALCOLO, nome_fase_previsioni
+from core.rendering import riduci_serie
+from core.timeindex import serie_condivisa
+
 st.set_page_config(page_title="Simulazione Forecast", layout="wide")
 
+
+@st.cache_data(show_spinner=False)
+def previsioni_finestra(chiave_modello, chiave_df, finestra, cols_modello, _model, _X_test):
+    # Una sola predict vettorizzata per tutta la finestra: lo slider poi
+    # legge solo dall'array già calcolato. Le righe con feature mancanti
+    # (ore assenti nel CSV prima dei lag) restano NaN
+    return previsioni_serie(_model, _X_test, cols_modello)
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def traiettorie_ricorsive(chiave_modello, chiave_df, finestra, orizzonte, cols_modello, _model, _serie, _matrice, _partenze):
+    # Una predict per passo per tutte le partenze della finestra: lo slider
+    # sceglie solo quale traiettoria mostrare
+    # Le partenze con ore mancanti nello storico o nell'orizzonte restano NaN
+    return previsione_ricorsiva(
+        _model, frame_feature(_matrice, cols_modello), _serie.df['cnt'].to_numpy(), _partenze, orizzonte, cols_modello,
+        tempi=_serie.tempi
+    )
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def matrice_modello(chiave_df, col_data, cols_modello, _serie):
+    # Feature del modello su tutta la serie (float32 contigua, su disco per
+    # hash dei dati): costruita una volta, ai rerun si fanno solo slice di righe
+    return matrice_feature(_serie.df, cols_modello, chiave=f"{chiave_df}:{col_data}")
+
+
 st.title("🔮 Simulazione Forecasting in Tempo Reale")
 st.markdown("Scorri la linea temporale per generare previsioni basate sui dati storici di input.")
 
+# --- STRUMENTAZIONE (tempo / memoria / righe per sezione, log JSON) ---
+debug_perf = st.sidebar.toggle("🐞 Pannello performance", key="toggle_debug_perf_forecast")
+pannello_perf = st.sidebar.empty()
+
+
+def mostra_misure(sezioni):
+    pannello_perf.dataframe(pd.DataFrame(sezioni).set_index('sezione'))
+
+
+perf = Strumentazione(
+    "2Forecast",
+    traccia_memoria=debug_perf or TRACCIA_MEMORIA,
+    al_termine=mostra_misure if debug_perf else None
+)
+
 # ==============================================================================
 # 1. CONTROLLO DATI CONDIVISI
 # ==============================================================================
@@ -16,7 +67,8 @@ if 'df_condiviso' not in st.session_state:
     st.info("Torna alla pagina principale (Home) e carica il file CSV.")
     st.stop()
 
-df = st.session_state['df_condiviso'].copy()
+# Frame condiviso in sola lettura: nessuna copia, la pagina lavora su viste
+df = st.session_state['df_condiviso']
 
 # ==============================================================================
 # 2. CARICAMENTO MODELLO
@@ -26,33 +78,69 @@ with st.sidebar:
     model_file = st.file_uploader("Carica Modello (.joblib)", type=["joblib"])
 
 model = None
+chiave_modello = None
 if model_file:
     try:
-        model = joblib.load(model_file)
+        # Il file viene scritto nel registro solo quando cambia l'upload
+        with perf.sezione('caricamento_modello'):
+            if st.session_state.get('modello_file_id') != model_file.file_id:
+                st.session_state['modello_hash'] = registra_modello(model_file.getvalue())
+                st.session_state['modello_file_id'] = model_file.file_id
+            chiave_modello = st.session_state['modello_hash']
+
+            # Nessuna deserializzazione ai rerun successivi (cache di processo)
+            model, info_modello = modello_condiviso(chiave_modello)
         st.success("Modello pronto per il forecast.")
+
+        with st.sidebar.expander("ℹ️ Dettagli Modello"):
+            st.write(f"**Caricamento:** {info_modello['tempo_caricamento_s'] * 1000:.0f} ms")
+            st.write(f"**Dimensione:** {info_modello['byte'] / 1024**2:.2f} MB")
+            st.write("**Feature:**", info_modello['feature_names'] or "non disponibili")
     except Exception as e:
         st.error(f"Errore caricamento: {e}")
 
 # ==============================================================================
-# 3. PREPARAZIONE DATI (FILTRO DICEMBRE 2012)
+# 3. PREPARAZIONE DATI (FINESTRA CONFIGURABILE)
 # ==============================================================================
 col_data = df.columns[0] # Assumiamo la prima colonna sia la data
 try:
-    df[col_data] = pd.to_datetime(df[col_data])
+    with perf.sezione('indice_temporale', righe=len(df)):
+        serie = serie_condivisa(st.session_state.get('df_hash', str(id(df))), col_data, df)
 except Exception as e:
     st.error(f"Impossibile convertire '{col_data}' in date.")
     st.stop()
 
-# Range richiesto
-start_date = "2012-12-01"
-end_date = "2013-01-01"
+# Finestra di default: Dicembre 2012 se presente, altrimenti l'ultimo mese di dati
+default_start = pd.Timestamp("2012-12-01")
+default_end = pd.Timestamp("2013-01-01")
+if not (serie.inizio <= default_start <= serie.fine):
+    default_end = serie.fine.normalize() + pd.Timedelta(days=1)
+    default_start = max(serie.inizio.normalize(), default_end - pd.Timedelta(days=31))
+
+with st.sidebar:
+    st.subheader("Finestra di simulazione")
+    start_date = pd.Timestamp(st.date_input(
+        "Inizio finestra",
+        value=default_start.date(),
+        min_value=serie.inizio.date(),
+        max_value=serie.fine.date()
+    ))
+    end_date = pd.Timestamp(st.date_input(
+        "Fine finestra (esclusa)",
+        value=default_end.date(),
+        min_value=serie.inizio.date()
+    ))
+    orizzonte = st.slider("Orizzonte forecast multi-step (ore)", min_value=24, max_value=168, value=24, step=24)
 
-# Filtriamo il dataset per il mese di test
-mask = (df[col_data] >= start_date) & (df[col_data] < end_date)
-df_test = df.loc[mask].sort_values(by=col_data).reset_index(drop=True)
+# Slicing per ricerca binaria sull'indice ordinato (nessuna maschera su tutto il dataset)
+with perf.sezione('slicing_finestra') as misura:
+    inizio_finestra, fine_finestra = serie.limiti(start_date, end_date)
+    df_test = serie.df.iloc[inizio_finestra:fine_finestra]
+    tempi_test = serie.tempi[inizio_finestra:fine_finestra]
+    misura['righe'] = len(df_test)
 
 if df_test.empty:
-    st.error("Nessun dato trovato nel range Dicembre 2012.")
+    st.error(f"Nessun dato trovato nel range {start_date:%Y-%m-%d} - {end_date:%Y-%m-%d}.")
     st.stop()
 
 # ==============================================================================
@@ -61,20 +149,23 @@ if df_test.empty:
 if model is not None:
     st.subheader("🗓️ Seleziona il momento della previsione")
     
-    # Lista date formattate
-    opzioni_date = df_test[col_data].dt.strftime('%Y-%m-%d %H:%M:%S').tolist()
-    
-    # Slider
-    data_selezionata_str = st.select_slider(
+    # Slider direttamente sui timestamp della finestra (formattati solo per la UI)
+    data_corrente_dt = st.select_slider(
         "Spostati nel tempo:",
-        options=opzioni_date,
-        value=opzioni_date[0] # Parte dall'inizio
+        options=tempi_test,
+        value=tempi_test[0], # Parte dall'inizio
+        format_func=lambda t: t.strftime('%Y-%m-%d %H:%M:%S')
     )
+    data_selezionata_str = data_corrente_dt.strftime('%Y-%m-%d %H:%M:%S')
     
-    # Troviamo la riga corrispondente alla selezione
-    riga_selezionata = df_test[df_test[col_data].astype(str) == data_selezionata_str]
+    # Troviamo la riga corrispondente alla selezione (ricerca binaria)
+    pos_globale = serie.posizione(data_corrente_dt)
     
-    if not riga_selezionata.empty:
+    if pos_globale is not None:
+        # Posizione relativa all'inizio della finestra
+        pos = pos_globale - inizio_finestra
+        riga_selezionata = df_test.iloc[[pos]]
+
         # ==========================================================================
         # 5. ESECUZIONE PREDIZIONE
         # ==========================================================================
@@ -83,22 +174,58 @@ if model is not None:
         if hasattr(model, 'feature_names_in_'):
             cols_modello = model.feature_names_in_
             
-            # Verifica colonne
-            missing = [c for c in cols_modello if c not in riga_selezionata.columns]
+            # Verifica colonne: one-hot, calendario e lag di cnt mancanti nel
+            # CSV vengono costruiti dalla pipeline di feature condivisa
+            missing = feature_mancanti(serie.df, cols_modello)
+            profondita = profondita_lag(cols_modello)
+            usa_lag = profondita > 0
             
             if not missing:
-                # Dati di input per il modello
-                X_input = riga_selezionata[cols_modello]
+                chiave_df = st.session_state.get('df_hash')
+                with perf.sezione('matrice_feature', righe=len(serie)):
+                    matrice = matrice_modello(chiave_df, col_data, tuple(cols_modello), serie)
+                    # Slice di righe della matrice contigua: nessuna selezione di colonne
+                    X_test = matrice[inizio_finestra:fine_finestra]
+                # Le righe con feature mancanti restano senza previsione: ci si
+                # ferma solo se non ne resta nessuna nella finestra
+                if np.isnan(X_test).any(axis=1).all():
+                    if usa_lag:
+                        st.error(f"Il modello usa i lag di cnt: servono {profondita} ore di dati prima della finestra.")
+                    else:
+                        st.error("Alcune feature del modello hanno valori mancanti nella finestra.")
+                    st.stop()
+
+                # Previsioni sull'intero dataset in background (una volta per modello e dataset)
+                fase_previsioni = nome_fase_previsioni(chiave_modello)
+                PRECALCOLO.avvia(chiave_df, fase_previsioni, previsioni_serie, model, matrice, tuple(cols_modello))
+
+                # PREDIZIONE BATCH su tutta la finestra (in cache per modello, dati e finestra)
+                with perf.sezione('predizione_batch', righe=len(df_test)):
+                    if PRECALCOLO.pronto(chiave_df, fase_previsioni):
+                        previsioni = PRECALCOLO.risultato(chiave_df, fase_previsioni)[inizio_finestra:fine_finestra]
+                    else:
+                        previsioni = previsioni_finestra(
+                            chiave_modello,
+                            chiave_df,
+                            (start_date, end_date),
+                            tuple(cols_modello),
+                            model,
+                            X_test
+                        )
                 
-                # PREDIZIONE
-                predizione = model.predict(X_input)[0]
+                    # La posizione nella finestra indicizza direttamente l'array
+                    predizione = previsioni[pos]
                 
                 # --- VISUALIZZAZIONE KPI ---
                 st.markdown("### Risultato Forecast")
                 c1, c2, c3 = st.columns(3)
                 c1.info(f"📅 Data: {data_selezionata_str}")
                 # Mostriamo la predizione in grande
-                c2.metric("Noleggi Previsti (cnt)", f"{predizione:.0f}")
+                if np.isnan(predizione):
+                    c2.metric("Noleggi Previsti (cnt)", "n/d")
+                    st.warning("Feature mancanti per il momento selezionato: mancano nel CSV le ore richieste dai lag di cnt.")
+                else:
+                    c2.metric("Noleggi Previsti (cnt)", f"{predizione:.0f}")
                 
                 # Mostriamo un parametro chiave di input (es. Temp) per contesto
                 temp_val = riga_selezionata['temp'].values[0] if 'temp' in riga_selezionata.columns else 0
@@ -112,39 +239,113 @@ if model is not None:
                 
                 # Prendiamo i dati storici FINO alla data selezionata (escluso il futuro)
                 # Così simuliamo di non sapere cosa succede dopo
-                data_corrente_dt = pd.to_datetime(data_selezionata_str)
-                df_history = df_test[df_test[col_data] <= data_corrente_dt]
+                with perf.sezione('grafico_forecast', righe=len(df_test)):
+                    df_history = df_test.iloc[:pos + 1]
+                
+                    # Downsampling LTTB delle linee: payload costante anche su finestre lunghe
+                    x_storico, y_storico = riduci_serie(tempi_test[:pos + 1], df_history['cnt'])
+                    x_forecast, y_forecast = riduci_serie(tempi_test, previsioni)
                 
-                fig = go.Figure()
-
-                # 1. Linea dello STORICO (quello che è "già successo" fino ad ora)
-                fig.add_trace(go.Scatter(
-                    x=df_history[col_data],
-                    y=df_history['cnt'],
-                    mode='lines',
-                    name='Storico Acquisito',
-                    line=dict(color='rgba(0,100,250, 0.5)', width=2)
-                ))
-
-                # 2. Punto della PREVISIONE ATTUALE
-                fig.add_trace(go.Scatter(
-                    x=[data_corrente_dt],
-                    y=[predizione],
-                    mode='markers',
-                    name='Forecast Modello',
-                    marker=dict(color='red', size=15, symbol='star', line=dict(width=2, color='black'))
-                ))
-
-                fig.update_layout(
-                    title="Monitoraggio Previsione",
-                    xaxis_title="Tempo",
-                    yaxis_title="Valore cnt",
-                    xaxis_range=[pd.to_datetime(start_date), pd.to_datetime(end_date)], # Asse X fisso per tutto il mese
-                    yaxis_range=[0, df_test['cnt'].max() * 1.2], # Asse Y fisso per stabilità
-                    showlegend=True
-                )
-
-                st.plotly_chart(fig, use_container_width=True)
+                    fig = go.Figure()
+
+                    # 1. Linea dello STORICO (quello che è "già successo" fino ad ora)
+                    fig.add_trace(go.Scatter(
+                        x=x_storico,
+                        y=y_storico,
+                        mode='lines',
+                        name='Storico Acquisito',
+                        line=dict(color='rgba(0,100,250, 0.5)', width=2)
+                    ))
+
+                    # 2. Traiettoria prevista sull'intera finestra
+                    fig.add_trace(go.Scatter(
+                        x=x_forecast,
+                        y=y_forecast,
+                        mode='lines',
+                        name='Forecast Finestra',
+                        line=dict(color='rgba(239,85,59,0.6)', width=2, dash='dot')
+                    ))
+
+                    # 3. Punto della PREVISIONE ATTUALE
+                    fig.add_trace(go.Scatter(
+                        x=[data_corrente_dt],
+                        y=[predizione],
+                        mode='markers',
+                        name='Forecast Modello',
+                        marker=dict(color='red', size=15, symbol='star', line=dict(width=2, color='black'))
+                    ))
+
+                    fig.update_layout(
+                        title="Monitoraggio Previsione",
+                        xaxis_title="Tempo",
+                        yaxis_title="Valore cnt",
+                        xaxis_range=[start_date, end_date], # Asse X fisso per tutta la finestra
+                        yaxis_range=[0, max(df_test['cnt'].max(), np.nanmax(previsioni)) * 1.2], # Asse Y fisso per stabilità
+                        showlegend=True
+                    )
+
+                    st.plotly_chart(fig, use_container_width=True)
+
+                # ==========================================================================
+                # 7. FORECAST MULTI-STEP (RICORSIVO)
+                # ==========================================================================
+                # Il modello viene fatto avanzare di `orizzonte` ore da ogni ora della
+                # finestra; i lag di cnt usano le previsioni dei passi precedenti.
+                st.markdown("---")
+                st.subheader(f"⏩ Forecast a {orizzonte} ore")
+
+                partenze = np.arange(max(inizio_finestra, profondita), min(fine_finestra, len(serie) - orizzonte + 1))
+                if len(partenze) == 0:
+                    st.warning(f"Servono {profondita} ore di storico e {orizzonte} ore di dati dopo la finestra.")
+                else:
+                    with perf.sezione('forecast_multistep', righe=len(partenze) * orizzonte):
+                        traiettorie = traiettorie_ricorsive(
+                            chiave_modello,
+                            st.session_state.get('df_hash'),
+                            (start_date, end_date),
+                            orizzonte,
+                            tuple(cols_modello),
+                            model,
+                            serie,
+                            matrice,
+                            partenze
+                        )
+                        passi = np.arange(orizzonte)
+                        reali = serie.df['cnt'].to_numpy(dtype=float)[partenze[:, None] + passi]
+                        # Errore medio per ora di anticipo sulle partenze senza ore mancanti
+                        complete = ~np.isnan(traiettorie).any(axis=1)
+                        mae_orizzonte = np.full(orizzonte, np.nan)
+                        if complete.any():
+                            mae_orizzonte = np.abs(traiettorie[complete] - reali[complete]).mean(axis=0)
+
+                    col_traiettoria, col_errore = st.columns(2)
+
+                    k = pos_globale - partenze[0]
+                    if 0 <= k < len(partenze) and not complete[k]:
+                        col_traiettoria.info("Lo storico o l'orizzonte del momento selezionato ha ore mancanti nel CSV.")
+                    elif 0 <= k < len(partenze):
+                        tempi_traiettoria = serie.tempi[pos_globale:pos_globale + orizzonte]
+                        fig_step = go.Figure()
+                        fig_step.add_trace(go.Scatter(
+                            x=tempi_traiettoria, y=reali[k], mode='lines', name='Reale',
+                            line=dict(color='rgba(0,100,250, 0.5)', width=2)
+                        ))
+                        fig_step.add_trace(go.Scatter(
+                            x=tempi_traiettoria, y=traiettorie[k], mode='lines', name='Forecast ricorsivo',
+                            line=dict(color='rgba(239,85,59,0.8)', width=2, dash='dot')
+                        ))
+                        fig_step.update_layout(title=f"Traiettoria da {data_selezionata_str}",
+                                               xaxis_title="Tempo", yaxis_title="Valore cnt")
+                        col_traiettoria.plotly_chart(fig_step, use_container_width=True)
+                    else:
+                        col_traiettoria.info("Il momento selezionato non ha abbastanza storico o dati successivi.")
+
+                    fig_mae = go.Figure(go.Scatter(x=passi + 1, y=mae_orizzonte, mode='lines+markers'))
+                    fig_mae.update_layout(title=f"MAE per ora di anticipo ({int(complete.sum())} partenze)",
+                                          xaxis_title="Ore di anticipo", yaxis_title="MAE")
+                    col_errore.plotly_chart(fig_mae, use_container_width=True)
+                    if not usa_lag:
+                        st.caption("Il modello non usa lag di cnt: ogni passo dipende solo dalle feature esogene.")
                 
             else:
                 st.error(f"Mancano colonne nel CSV: {missing}")
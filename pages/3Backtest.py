@@ -0,0 +1,166 @@
+import os
+
+import streamlit as st
+import pandas as pd
+import plotly.graph_objects as go
+
+from core.backtest import esegui_backtest, finestre_walk_forward
+from core.features import feature_mancanti
+from core.models import modello_condiviso, registra_modello
+from core.timeindex import serie_condivisa
+
+st.set_page_config(page_title="Backtesting Modelli", layout="wide")
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def risultati_backtest(chiave_df, modelli, parametri, max_workers, _serie):
+    inizio, fine, giorni_finestra, giorni_passo = parametri
+    finestre = finestre_walk_forward(_serie.tempi, inizio, fine, giorni_finestra, giorni_passo)
+    dizionario_modelli = {nome: (chiave, features) for nome, chiave, features in modelli}
+    return esegui_backtest(_serie.df, _serie.tempi, dizionario_modelli, finestre, max_workers=max_workers)
+
+
+st.title("🧪 Backtesting Walk-Forward dei Modelli")
+st.markdown("Valuta uno o più modelli su finestre temporali consecutive e confrontane l'accuratezza.")
+
+# ==============================================================================
+# 1. CONTROLLO DATI CONDIVISI
+# ==============================================================================
+if 'df_condiviso' not in st.session_state:
+    st.warning("⚠️ Non hai caricato i dati storici!")
+    st.info("Torna alla pagina principale (Home) e carica il file CSV.")
+    st.stop()
+
+df = st.session_state['df_condiviso']
+col_data = df.columns[0] # Assumiamo la prima colonna sia la data
+chiave_df = st.session_state.get('df_hash', str(id(df)))
+try:
+    serie = serie_condivisa(chiave_df, col_data, df)
+except Exception as e:
+    st.error(f"Impossibile convertire '{col_data}' in date.")
+    st.stop()
+
+if 'cnt' not in df.columns:
+    st.error("La colonna 'cnt' non è presente nel dataset.")
+    st.stop()
+
+# ==============================================================================
+# 2. MODELLI DA CONFRONTARE
+# ==============================================================================
+with st.sidebar:
+    st.header("Modelli")
+    model_files = st.file_uploader("Carica uno o più modelli (.joblib)", type=["joblib"],
+                                   accept_multiple_files=True)
+    usa_modello_forecast = False
+    if 'modello_hash' in st.session_state:
+        usa_modello_forecast = st.checkbox("Includi il modello della pagina Forecast", value=True)
+
+# nome -> chiave nel registro
+candidati = {}
+if usa_modello_forecast:
+    candidati["Modello Forecast"] = st.session_state['modello_hash']
+for f in model_files or []:
+    try:
+        candidati[f.name] = registra_modello(f.getvalue())
+    except Exception as e:
+        st.error(f"Errore caricamento {f.name}: {e}")
+
+modelli = []
+for nome, chiave in candidati.items():
+    try:
+        _, info = modello_condiviso(chiave)
+    except Exception as e:
+        st.error(f"Errore caricamento {nome}: {e}")
+        continue
+    features = info['feature_names']
+    if features is None:
+        st.warning(f"{nome}: il modello non ha i nomi delle feature salvati, escluso.")
+        continue
+    missing = feature_mancanti(df, features)
+    if missing:
+        st.warning(f"{nome}: mancano colonne nel CSV {missing}, escluso.")
+        continue
+    modelli.append((nome, chiave, tuple(features)))
+
+if not modelli:
+    st.info("👈 Carica almeno un modello nella sidebar per iniziare il backtest.")
+    st.stop()
+
+# ==============================================================================
+# 3. PARAMETRI WALK-FORWARD
+# ==============================================================================
+with st.sidebar:
+    st.header("Finestre di valutazione")
+    default_start = max(serie.inizio.normalize(), serie.fine.normalize() - pd.Timedelta(days=365))
+    inizio = pd.Timestamp(st.date_input("Inizio valutazione", value=default_start.date(),
+                                        min_value=serie.inizio.date(), max_value=serie.fine.date()))
+    fine = pd.Timestamp(st.date_input("Fine valutazione (esclusa)",
+                                      value=(serie.fine.normalize() + pd.Timedelta(days=1)).date(),
+                                      min_value=serie.inizio.date()))
+    giorni_finestra = st.number_input("Durata finestra (giorni)", min_value=1, value=7)
+    giorni_passo = st.number_input("Passo tra finestre (giorni)", min_value=1, value=7)
+    max_workers = int(st.number_input("Processi paralleli", min_value=1, max_value=os.cpu_count() or 1,
+                                      value=os.cpu_count() or 1))
+
+if st.button("▶️ Esegui backtest", type="primary"):
+    with st.spinner("Valutazione in corso..."):
+        st.session_state['backtest'] = risultati_backtest(
+            chiave_df,
+            tuple(modelli),
+            (inizio, fine, int(giorni_finestra), int(giorni_passo)),
+            max_workers,
+            serie
+        )
+
+risultati = st.session_state.get('backtest')
+if not risultati:
+    st.info("Imposta le finestre nella sidebar e premi **Esegui backtest**.")
+    st.stop()
+
+# ==============================================================================
+# 4. RISULTATI
+# ==============================================================================
+st.subheader("📋 Riepilogo Accuratezza")
+st.dataframe(risultati['riepilogo'].style.format(
+    {'MAE': '{:.1f}', 'RMSE': '{:.1f}', 'MAPE': '{:.1f}%', 'Bias': '{:+.1f}', 'n': '{:.0f}'}))
+
+metrica = st.radio("Metrica:", ['MAE', 'RMSE', 'MAPE', 'Bias'], horizontal=True, key="radio_metrica_backtest")
+
+# --- ANDAMENTO PER FINESTRA ---
+fig_finestre = go.Figure()
+for nome, dati_modello in risultati['per_finestra'].groupby('modello', sort=False):
+    fig_finestre.add_trace(go.Scatter(
+        x=dati_modello['inizio'],
+        y=dati_modello[metrica],
+        mode='lines+markers',
+        name=nome
+    ))
+fig_finestre.update_layout(
+    title=f"{metrica} per finestra walk-forward",
+    xaxis_title="Inizio finestra",
+    yaxis_title=metrica,
+    template="plotly_white",
+    hovermode="x unified"
+)
+st.plotly_chart(fig_finestre, use_container_width=True)
+
+# --- SCOMPOSIZIONE PER ORA / GIORNO / METEO ---
+tab_ora, tab_giorno, tab_meteo = st.tabs(["🕐 Per Ora", "📅 Per Giorno", "🌤️ Per Meteo"])
+for tab, chiave, titolo in [
+    (tab_ora, 'per_ora', "Ora del giorno"),
+    (tab_giorno, 'per_giorno', "Giorno della settimana"),
+    (tab_meteo, 'per_meteo', "Condizione Meteo"),
+]:
+    with tab:
+        tabella = risultati[chiave][metrica].unstack(level=0)
+        fig = go.Figure()
+        for nome in tabella.columns:
+            fig.add_trace(go.Bar(x=tabella.index.astype(str), y=tabella[nome], name=nome))
+        fig.update_layout(
+            title=f"{metrica} per {titolo.lower()}",
+            xaxis_title=titolo,
+            yaxis_title=metrica,
+            barmode='group',
+            template="plotly_white"
+        )
+        st.plotly_chart(fig, use_container_width=True)
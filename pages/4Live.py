@@ -0,0 +1,134 @@
+import streamlit as st
+import pandas as pd
+import numpy as np
+import plotly.graph_objects as go
+
+from core.instrumentation import TRACCIA_MEMORIA, Strumentazione
+from core.live import MonitorLive
+from core.models import modello_condiviso, registra_modello
+from core.rendering import riduci_serie
+
+st.set_page_config(page_title="Monitoraggio Live", layout="wide")
+
+# Ore di storico recente mostrate nel grafico reale vs previsto
+ORE_RECENTI = 168
+
+
+st.title("📡 Monitoraggio Live")
+st.markdown("Segue un CSV in append (o una cartella di CSV) e aggiorna KPI e previsioni solo con le righe nuove.")
+
+perf = Strumentazione("4Live", traccia_memoria=TRACCIA_MEMORIA)
+
+# ==============================================================================
+# 1. SORGENTE E MODELLO
+# ==============================================================================
+with st.sidebar:
+    st.header("Sorgente live")
+    percorso = st.text_input("File CSV o cartella sul server", key="percorso_live")
+    intervallo = int(st.number_input("Controllo ogni (secondi)", min_value=1, value=5, key="intervallo_live"))
+
+    st.header("Modello (opzionale)")
+    model_file = st.file_uploader("Carica Modello (.joblib)", type=["joblib"], key="modello_live")
+    usa_modello_forecast = False
+    if model_file is None and 'modello_hash' in st.session_state:
+        usa_modello_forecast = st.checkbox("Usa il modello della pagina Forecast", value=True)
+
+if not percorso:
+    st.info("👈 Indica nella sidebar il file o la cartella da monitorare.")
+    st.stop()
+
+chiave_modello = None
+model = None
+features = None
+try:
+    if model_file is not None:
+        chiave_modello = registra_modello(model_file.getvalue())
+    elif usa_modello_forecast:
+        chiave_modello = st.session_state['modello_hash']
+    if chiave_modello is not None:
+        model, info_modello = modello_condiviso(chiave_modello)
+        features = info_modello['feature_names']
+        if features is None:
+            st.sidebar.warning("Il modello non ha i nomi delle feature salvati: nessuna previsione.")
+except Exception as e:
+    st.sidebar.error(f"Errore caricamento modello: {e}")
+
+# Un monitor per sessione: ricreato (e riletto da capo) solo se cambiano sorgente o modello
+chiave_monitor = (percorso, chiave_modello)
+if st.session_state.get('monitor_live_chiave') != chiave_monitor:
+    st.session_state['monitor_live'] = MonitorLive(percorso, model, features)
+    st.session_state['monitor_live_chiave'] = chiave_monitor
+monitor = st.session_state['monitor_live']
+
+
+# ==============================================================================
+# 2. PANNELLO AGGIORNATO PERIODICAMENTE
+# ==============================================================================
+@st.fragment(run_every=intervallo)
+def pannello_live():
+    # Solo questo blocco viene rieseguito ad ogni controllo
+    try:
+        with perf.sezione('aggiornamento_live') as misura:
+            misura['righe'] = monitor.aggiorna()
+    except Exception as e:
+        st.error(f"Errore nella lettura delle righe nuove: {e}")
+        return
+
+    if monitor.n_righe == 0:
+        st.info(f"In attesa di dati da `{percorso}`...")
+        return
+
+    stats_cnt = monitor.accumulatore.statistiche('cnt')
+    giornaliero = monitor.giornaliero.tabella()
+
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("Righe ricevute", f"{monitor.n_righe:,}", delta=f"+{monitor.ultime_righe}")
+    c2.metric("Media cnt", f"{stats_cnt['mean']:.0f}")
+    if len(giornaliero):
+        kpi_avg = giornaliero['kpi_efficiency_rate'].mean()
+        kpi_last = giornaliero['kpi_efficiency_rate'].iloc[-1]
+        c3.metric("Efficienza Media Giornaliera", f"{kpi_avg:.1f}%")
+        c4.metric("Efficienza Ultimo Giorno", f"{kpi_last:.1f}%", delta=f"{kpi_last - kpi_avg:.1f}%")
+
+    # --- ULTIME ORE: REALE VS PREVISTO ---
+    with perf.sezione('grafico_live') as misura:
+        recenti = monitor.ultime(ORE_RECENTI)
+        misura['righe'] = len(recenti)
+        tempi = pd.to_datetime(recenti[monitor.col_data])
+
+        fig = go.Figure()
+        fig.add_trace(go.Scatter(
+            x=tempi, y=recenti['cnt'], mode='lines', name='Reale',
+            line=dict(color='rgba(0,100,250, 0.5)', width=2)
+        ))
+        if 'previsione' in recenti.columns:
+            fig.add_trace(go.Scatter(
+                x=tempi, y=recenti['previsione'], mode='lines', name='Previsione',
+                line=dict(color='rgba(239,85,59,0.8)', width=2, dash='dot')
+            ))
+        fig.update_layout(title=f"Ultime {len(recenti)} righe", xaxis_title="Tempo",
+                          yaxis_title="Valore cnt", hovermode="x unified")
+        st.plotly_chart(fig, use_container_width=True)
+
+    if 'previsione' in recenti.columns:
+        errori = np.abs(recenti['cnt'] - recenti['previsione'])
+        st.caption(f"MAE sulle ultime {errori.count()} righe previste: {errori.mean():.1f}")
+
+    col_kpi, col_meteo = st.columns(2)
+
+    # --- TREND KPI GIORNALIERO ---
+    with col_kpi:
+        x_kpi, y_kpi = riduci_serie(giornaliero.index, giornaliero['kpi_efficiency_rate'])
+        fig_kpi = go.Figure(go.Scatter(x=x_kpi, y=y_kpi, mode='lines', name='% Registrati',
+                                       line=dict(color='#00CC96', width=2)))
+        fig_kpi.update_layout(title="Efficienza giornaliera (% Registrati)", template="plotly_white",
+                              yaxis_title="% Registrati")
+        st.plotly_chart(fig_kpi, use_container_width=True)
+
+    # --- MEDIE METEO ---
+    with col_meteo:
+        st.markdown("#### 🌤️ Medie per anno e meteo")
+        st.dataframe(monitor.accumulatore.tabella_meteo(), hide_index=True)
+
+
+pannello_live()
@@ -0,0 +1,194 @@
+import streamlit as st
+import plotly.graph_objects as go
+
+from core.instrumentation import TRACCIA_MEMORIA, Strumentazione
+from core.models import modello_condiviso, registra_modello
+from core.panel import (Panel, errori_per_serie, kpi_giornalieri, previsioni_panel,
+                        riepilogo_serie, trova_colonna_id)
+from core.rendering import riduci_serie
+
+st.set_page_config(page_title="Analisi Multi-Stazione", layout="wide")
+
+# Colonne su cui ordinare la classifica (colonna -> etichetta)
+METRICHE_CLASSIFICA = {
+    'cnt_totale': "Noleggi totali",
+    'cnt_medio': "Noleggi medi per ora",
+    'efficienza': "Efficienza (% Registrati)",
+    'calo_meteo_pct': "Calo con maltempo (%)",
+    'MAE': "Errore del modello (MAE)",
+}
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def panel_dataset(chiave_df, col_id, _df):
+    # Ordinamento per (serie, tempo) fatto una sola volta per dataset e colonna ID
+    return Panel(_df, col_id)
+
+
+# I risultati sono condivisi tra sessioni senza copia (cache_resource):
+# la pagina li legge soltanto, ogni modifica passa da un nuovo oggetto
+@st.cache_resource(show_spinner=False, max_entries=4)
+def analisi_panel(chiave_df, col_id, _panel):
+    # KPI giornalieri e riepilogo di tutte le serie in un solo passaggio vettorizzato
+    giornaliero = kpi_giornalieri(_panel)
+    return giornaliero, riepilogo_serie(_panel, giornaliero)
+
+
+@st.cache_resource(show_spinner=False, max_entries=4)
+def previsioni_dataset(chiave_modello, chiave_df, col_id, features, _model, _panel):
+    # Una sola predict batch su tutte le righe di tutte le serie
+    previsioni = previsioni_panel(_model, _panel, features)
+    previsioni.setflags(write=False)
+    return previsioni, errori_per_serie(_panel, previsioni)
+
+
+st.title("🚲 Analisi Multi-Stazione")
+st.markdown("KPI, sensibilità al meteo e previsioni per tutte le serie del dataset, con classifica e dettaglio.")
+
+perf = Strumentazione("5Stazioni", traccia_memoria=TRACCIA_MEMORIA)
+
+# ==============================================================================
+# 1. CONTROLLO DATI CONDIVISI E COLONNA ID
+# ==============================================================================
+if 'df_condiviso' not in st.session_state:
+    st.warning("⚠️ Non hai caricato i dati storici!")
+    st.info("Torna alla pagina principale (Home) e carica il file CSV.")
+    st.stop()
+
+df = st.session_state['df_condiviso']
+chiave_df = st.session_state.get('df_hash', str(id(df)))
+
+if 'cnt' not in df.columns:
+    st.error("La colonna 'cnt' non è presente nel dataset.")
+    st.stop()
+
+with st.sidebar:
+    st.header("Serie")
+    opzioni_id = list(df.columns[1:])
+    col_id_default = trova_colonna_id(df)
+    col_id = st.selectbox(
+        "Colonna ID della serie",
+        opzioni_id,
+        index=opzioni_id.index(col_id_default) if col_id_default in opzioni_id else 0,
+        key="colonna_id_panel"
+    )
+
+if col_id_default is None:
+    st.info("Nessuna colonna ID riconosciuta (es. 'station_id'): scegli quella corretta nella sidebar.")
+
+try:
+    with perf.sezione('ordinamento_panel', righe=len(df)):
+        panel = panel_dataset(chiave_df, col_id, df)
+    with perf.sezione('kpi_panel', righe=len(df)):
+        giornaliero, riepilogo = analisi_panel(chiave_df, col_id, panel)
+except Exception as e:
+    st.error(f"Impossibile costruire il panel su '{col_id}': {e}")
+    st.stop()
+
+if panel.righe_senza_id:
+    st.warning(f"{panel.righe_senza_id:,} righe senza valore in '{col_id}' escluse dall'analisi.")
+
+# ==============================================================================
+# 2. MODELLO (OPZIONALE)
+# ==============================================================================
+with st.sidebar:
+    st.header("Modello (opzionale)")
+    model_file = st.file_uploader("Carica Modello (.joblib)", type=["joblib"], key="modello_panel")
+    usa_modello_forecast = False
+    if model_file is None and 'modello_hash' in st.session_state:
+        usa_modello_forecast = st.checkbox("Usa il modello della pagina Forecast", value=True)
+
+previsioni = None
+try:
+    chiave_modello = None
+    if model_file is not None:
+        chiave_modello = registra_modello(model_file.getvalue())
+    elif usa_modello_forecast:
+        chiave_modello = st.session_state['modello_hash']
+
+    if chiave_modello is not None:
+        model, info_modello = modello_condiviso(chiave_modello)
+        features = info_modello['feature_names']
+        if features is None:
+            st.warning("Il modello non ha i nomi delle feature salvati: previsioni escluse.")
+        else:
+            with perf.sezione('previsioni_panel', righe=len(df)):
+                previsioni, errori = previsioni_dataset(chiave_modello, chiave_df, col_id, tuple(features), model, panel)
+            riepilogo = riepilogo.join(errori)
+except Exception as e:
+    st.error(f"Errore nelle previsioni: {e}")
+
+# ==============================================================================
+# 3. PANORAMICA E CLASSIFICA
+# ==============================================================================
+c1, c2, c3 = st.columns(3)
+c1.metric("Serie", f"{panel.n_serie:,}")
+c2.metric("Righe", f"{len(panel):,}")
+if 'efficienza' in riepilogo.columns:
+    c3.metric("Efficienza complessiva", f"{riepilogo['efficienza'].mean():.1f}%")
+
+st.subheader("🏆 Classifica")
+metriche = {c: e for c, e in METRICHE_CLASSIFICA.items() if c in riepilogo.columns}
+col_metrica, col_ordine, col_n = st.columns([2, 1, 1])
+metrica = col_metrica.selectbox("Ordina per", list(metriche), format_func=metriche.get, key="metrica_panel")
+decrescente = col_ordine.radio("Ordine", ["Decrescente", "Crescente"], horizontal=True,
+                               key="ordine_panel") == "Decrescente"
+n_top = int(col_n.number_input("Serie mostrate", min_value=1, max_value=max(panel.n_serie, 1),
+                               value=min(20, panel.n_serie), key="n_top_panel"))
+
+classifica = riepilogo.sort_values(metrica, ascending=not decrescente)
+top = classifica.head(n_top)
+
+fig_top = go.Figure(go.Bar(x=top.index.astype(str), y=top[metrica], marker_color='#636EFA'))
+fig_top.update_layout(title=f"Top {len(top)} per {metriche[metrica].lower()}", xaxis_title=col_id,
+                      yaxis_title=metriche[metrica], template="plotly_white", xaxis_type='category')
+st.plotly_chart(fig_top, use_container_width=True)
+st.dataframe(top.style.format(precision=1))
+
+# ==============================================================================
+# 4. DETTAGLIO DI UNA SERIE
+# ==============================================================================
+st.markdown("---")
+st.subheader("🔍 Dettaglio serie")
+id_scelto = st.selectbox(f"Scegli {col_id}", classifica.index.tolist(), key="serie_panel")
+
+with perf.sezione('dettaglio_serie') as misura:
+    # Intervallo contiguo della serie: nessun filtro sull'intero dataset
+    i, j = panel.limiti(id_scelto)
+    dati_serie = panel.df.iloc[i:j]
+    tempi_serie = panel.tempi[i:j]
+    misura['righe'] = len(dati_serie)
+    kpi_serie = giornaliero.xs(panel.ids.get_loc(id_scelto), level='serie')
+
+    k1, k2, k3 = st.columns(3)
+    riga = riepilogo.loc[id_scelto]
+    k1.metric("Noleggi medi per ora", f"{riga['cnt_medio']:.0f}")
+    if 'efficienza' in riga:
+        k2.metric("Efficienza", f"{riga['efficienza']:.1f}%")
+    if 'calo_meteo_pct' in riga:
+        k3.metric("Calo con maltempo", f"{riga['calo_meteo_pct']:.1f}%")
+
+    col_kpi, col_prev = st.columns(2)
+    with col_kpi:
+        if 'registered' not in panel.df.columns:
+            st.info("Colonna 'registered' non presente: efficienza giornaliera non disponibile.")
+        else:
+            x_kpi, y_kpi = riduci_serie(kpi_serie.index, kpi_serie['kpi_efficiency_rate'])
+            fig_kpi = go.Figure(go.Scatter(x=x_kpi, y=y_kpi, mode='lines', name='% Registrati',
+                                           line=dict(color='#00CC96', width=2)))
+            fig_kpi.update_layout(title="Efficienza giornaliera (% Registrati)", template="plotly_white",
+                                  yaxis_title="% Registrati")
+            st.plotly_chart(fig_kpi, use_container_width=True)
+
+    with col_prev:
+        fig_serie = go.Figure()
+        x_reale, y_reale = riduci_serie(tempi_serie, dati_serie['cnt'])
+        fig_serie.add_trace(go.Scatter(x=x_reale, y=y_reale, mode='lines', name='Reale',
+                                       line=dict(color='rgba(0,100,250, 0.5)', width=2)))
+        if previsioni is not None:
+            x_prev, y_prev = riduci_serie(tempi_serie, previsioni[i:j])
+            fig_serie.add_trace(go.Scatter(x=x_prev, y=y_prev, mode='lines', name='Previsione',
+                                           line=dict(color='rgba(239,85,59,0.8)', width=2, dash='dot')))
+        fig_serie.update_layout(title=f"cnt: {col_id} = {id_scelto}", xaxis_title="Tempo",
+                                yaxis_title="Valore cnt", hovermode="x unified")
+        st.plotly_chart(fig_serie, use_container_width=True)
@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.weather import COLONNE_METEO
+
+
+@pytest.fixture
+def dati():
+    """Generatore di righe orarie sintetiche (volumi + meteo One-Hot)."""
+    def _dati(n, inizio='2011-01-01', seed=0):
+        rng = np.random.default_rng(seed)
+        df = pd.DataFrame({
+            'datetime': pd.date_range(inizio, periods=n, freq='h'),
+            'registered': rng.integers(0, 100, n),
+            'casual': rng.integers(0, 50, n),
+        })
+        df['cnt'] = df['registered'] + df['casual']
+        codici = rng.integers(0, len(COLONNE_METEO), n)
+        for i, col in enumerate(COLONNE_METEO):
+            df[col] = (codici == i).astype(int)
+        return df
+    return _dati
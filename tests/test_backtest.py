@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import core.backtest as backtest
+from core.backtest import esegui_backtest, finestre_walk_forward, metriche
+
+
+def test_metriche_ignorano_le_righe_senza_previsione():
+    m = metriche([10, 20, 0, 40], [12, 17, 5, np.nan])
+
+    assert m['n'] == 3
+    assert m['MAE'] == pytest.approx((2 + 3 + 5) / 3)
+    assert m['RMSE'] == pytest.approx(np.sqrt((4 + 9 + 25) / 3))
+    # MAPE solo dove il reale è diverso da zero
+    assert m['MAPE'] == pytest.approx((0.2 + 0.15) / 2 * 100)
+    assert m['Bias'] == pytest.approx((2 - 3 + 5) / 3)
+    assert np.isnan(metriche([1.0], [np.nan])['MAE'])
+
+
+class _ModelloLag:
+    """Previsione = cnt dell'ora precedente; rifiuta input con NaN come LinearRegression."""
+
+    def predict(self, X):
+        assert not X.isna().any().any()
+        return X['cnt_lag_1'].to_numpy()
+
+
+def test_backtest_per_finestra_e_riepilogo(monkeypatch):
+    monkeypatch.setattr(backtest, '_modello', lambda chiave: _ModelloLag())
+    n = 24 * 6
+    tempi = pd.date_range('2011-01-01', periods=n, freq='h')
+    cnt = np.arange(n, dtype=float) % 24 + 1
+    df = pd.DataFrame({'datetime': tempi, 'cnt': cnt}).drop(index=[60, 61]).reset_index(drop=True)
+    tempi = pd.DatetimeIndex(df['datetime'])
+
+    finestre = finestre_walk_forward(tempi, '2011-01-02', '2011-01-06', 2, 2)
+    risultati = esegui_backtest(df, tempi, {'lag': ('x', ['cnt_lag_1'])}, finestre, max_workers=1)
+
+    # Previsione attesa: cnt dell'ora prima, NaN dopo le ore mancanti
+    serie = df.set_index('datetime')['cnt']
+    pred = serie.reindex(tempi - pd.Timedelta(hours=1)).to_numpy()
+    y = df['cnt'].to_numpy()
+
+    per_finestra = risultati['per_finestra']
+    assert len(per_finestra) == len(finestre) == 2
+    for k, (i, j, _) in enumerate(finestre):
+        attese = metriche(y[i:j], pred[i:j])
+        for chiave in ('MAE', 'RMSE', 'MAPE', 'Bias', 'n'):
+            assert per_finestra[chiave].iloc[k] == pytest.approx(attese[chiave])
+    riepilogo = risultati['riepilogo'].loc['lag']
+    # 4 giorni valutati, meno le 2 ore mancanti e l'ora che segue
+    assert riepilogo['n'] == per_finestra['n'].sum() == 24 * 4 - 2 - 1
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import features
+from core.features import calcola_matrice, chiave_matrice, feature_mancanti
+
+
+def _orario(n=48, inizio='2011-01-01'):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'datetime': pd.date_range(inizio, periods=n, freq='h'),
+        'temp': rng.random(n),
+        'weathersit': rng.integers(1, 4, n),
+        'cnt': rng.integers(0, 100, n),
+    })
+
+
+def test_one_hot_solo_su_colonne_categoriche():
+    df = _orario()
+    assert feature_mancanti(df, ['temp_squared', 'temp_0.5', 'cnt_1', 'weathersit_9', 'yr_2012']) == [
+        'temp_squared', 'temp_0.5', 'cnt_1', 'weathersit_9', 'yr_2012']
+    # Valori del dominio ammessi anche se assenti dai dati (solo gennaio 2011)
+    features = ['weathersit_1.0', 'weathersit_4.0', 'mnth_1', 'mnth_12', 'hr_23', 'yr_2011']
+    assert feature_mancanti(df, features) == []
+
+    matrice = calcola_matrice(df, features)
+    np.testing.assert_array_equal(matrice[:, 0], df['weathersit'] == 1)
+    assert not matrice[:, 1].any() and not matrice[:, 3].any()
+    assert matrice[:, 2].all() and matrice[:, 5].all()
+    np.testing.assert_array_equal(matrice[:, 4], df['datetime'].dt.hour == 23)
+
+    with pytest.raises(KeyError):
+        calcola_matrice(df, ['temp_squared'])
+
+
+def test_calendario_dal_timestamp_anche_con_csv_grezzo():
+    # Convenzione del CSV grezzo: weekday 0 = domenica, yr 0/1
+    tempi = pd.date_range('2012-12-29', periods=24 * 5, freq='h')
+    grezzo = pd.DataFrame({
+        'datetime': tempi,
+        'yr': 1,
+        'mnth': tempi.month,
+        'hr': tempi.hour,
+        'weekday': (tempi.dayofweek + 1) % 7,
+        'cnt': 1,
+    })
+    features = ['weekday', 'yr', 'weekday_0', 'yr_2013', 'mnth_1']
+    matrice = calcola_matrice(grezzo, features)
+
+    np.testing.assert_array_equal(matrice[:, 0], tempi.dayofweek)
+    np.testing.assert_array_equal(matrice[:, 1], tempi.year)
+    np.testing.assert_array_equal(matrice[:, 2], tempi.dayofweek == 0)
+    np.testing.assert_array_equal(matrice[:, 3], tempi.year == 2013)
+    np.testing.assert_array_equal(matrice[:, 4], tempi.month == 1)
+
+
+def test_lag_nan_dove_mancano_ore():
+    df = _orario(72)
+    # Tre ore mancanti, come nel CSV grezzo
+    df = df.drop(index=[5, 6, 7]).reset_index(drop=True)
+    matrice = calcola_matrice(df, ['cnt_lag_1', 'cnt_lag_24', 'cnt_media_24h'])
+    tempi = df['datetime']
+    per_ora = df.set_index('datetime')['cnt'].astype(float)
+
+    for j, ore in ((0, 1), (1, 24)):
+        attesi = per_ora.reindex(tempi - pd.Timedelta(hours=ore)).to_numpy()
+        np.testing.assert_array_equal(matrice[:, j], attesi.astype(np.float32))
+    # 2011-01-02 05:00: il lag a 24 ore cade in un'ora mancante
+    assert np.isnan(matrice[tempi == pd.Timestamp('2011-01-02 05:00'), 1]).all()
+    completa = per_ora.reindex(pd.date_range(tempi.iloc[0], tempi.iloc[-1], freq='h'))
+    attese = completa.shift(1).rolling(24).mean().reindex(tempi).to_numpy()
+    np.testing.assert_allclose(matrice[:, 2], attese, rtol=1e-6)
+
+
+def test_chiave_matrice_cambia_con_la_versione(monkeypatch):
+    chiave = chiave_matrice('dati', ['temp', 'cnt_lag_1'])
+    monkeypatch.setattr(features, 'VERSIONE_FEATURE', features.VERSIONE_FEATURE + 1)
+    assert chiave_matrice('dati', ['temp', 'cnt_lag_1']) != chiave
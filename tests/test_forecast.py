@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression
+
+from core.features import calcola_matrice, frame_feature
+from core.forecast import previsione_ricorsiva
+from core.lags import BufferLag
+
+
+def _serie(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    tempi = pd.date_range('2011-01-01', periods=n, freq='h')
+    return pd.DataFrame({
+        'datetime': tempi,
+        'temp': rng.random(n),
+        'cnt': 100 + 50 * np.sin(np.arange(n) * 2 * np.pi / 24) + rng.normal(0, 5, n),
+    })
+
+
+FEATURES = ['temp', 'cnt_lag_1', 'cnt_lag_24', 'cnt_media_24h']
+
+
+def test_buffer_uguale_alla_pipeline():
+    df = _serie()
+    matrice = calcola_matrice(df, FEATURES)
+    y = df['cnt'].to_numpy()
+    partenze = np.array([30, 100, 250])
+    buffer = BufferLag.per_feature(y[partenze[:, None] - 24 + np.arange(24)], FEATURES)
+    for h in range(5):
+        attese = matrice[partenze + h]
+        for j, nome in enumerate(FEATURES[1:], start=1):
+            np.testing.assert_allclose(buffer.features()[nome], attese[:, j], rtol=1e-5)
+        buffer.aggiungi(y[partenze + h])
+
+
+def test_ricorsiva_nan_con_ore_mancanti():
+    df = _serie()
+    matrice = calcola_matrice(df, FEATURES)
+    valide = ~np.isnan(matrice).any(axis=1)
+    model = LinearRegression().fit(frame_feature(matrice[valide], FEATURES), df['cnt'][valide])
+
+    buchi = df.drop(index=[200, 201]).reset_index(drop=True)
+    X = frame_feature(calcola_matrice(buchi, FEATURES), FEATURES)
+    # 190: ore mancanti nell'orizzonte; 215: nelle 24 ore di storico
+    partenze = np.array([50, 190, 215, 260])
+    out = previsione_ricorsiva(model, X, buchi['cnt'].to_numpy(), partenze, 12, FEATURES,
+                               tempi=buchi['datetime'])
+    assert np.isfinite(out[[0, 3]]).all()
+    assert np.isnan(out[[1, 2]]).all()
+
+    senza_tempi = previsione_ricorsiva(model, X, buchi['cnt'].to_numpy(), partenze[[0, 3]], 12, FEATURES)
+    np.testing.assert_allclose(out[[0, 3]], senza_tempi)
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from core.live import CAPACITA_INIZIALE, MonitorLive, RollupGiornaliero
+
+
+def _giornaliere(df):
+    return df.groupby(df['datetime'].dt.floor('D'))[['casual', 'registered', 'cnt']].sum()
+
+
+def test_polling_ripetuto_e_append(tmp_path, dati):
+    percorso = tmp_path / "live.csv"
+    primo, secondo = dati(100), dati(80, inizio='2011-01-05 04:00', seed=1)
+    primo.to_csv(percorso, index=False)
+
+    monitor = MonitorLive(percorso)
+    assert monitor.aggiorna() == len(primo)
+    prima = monitor.accumulatore.tabella_meteo()
+    for _ in range(3):
+        # Poll senza righe nuove: nessun dato, stato invariato
+        assert monitor.aggiorna() == 0
+        pd.testing.assert_frame_equal(monitor.accumulatore.tabella_meteo(), prima)
+
+    secondo.to_csv(percorso, mode='a', header=False, index=False)
+    assert monitor.aggiorna() == len(secondo)
+    tutti = pd.concat([primo, secondo], ignore_index=True)
+    for _ in range(2):
+        assert monitor.accumulatore.tabella_meteo()['n'].sum() == len(tutti)
+
+    attese = _giornaliere(tutti)
+    ottenute = monitor.giornaliero.tabella()
+    np.testing.assert_array_equal(ottenute.index.to_numpy(), attese.index.to_numpy())
+    np.testing.assert_allclose(ottenute[attese.columns].to_numpy(), attese.to_numpy())
+
+
+def test_giorni_arretrati_oltre_la_capacita(dati):
+    rollup = RollupGiornaliero()
+    recenti = dati(24 * CAPACITA_INIZIALE, inizio='2013-01-01')
+    arretrati = dati(24 * 10, inizio='2012-01-01', seed=1)
+    for df in (recenti, arretrati):
+        rollup.aggiorna(df['datetime'], df)
+
+    attese = _giornaliere(pd.concat([arretrati, recenti], ignore_index=True))
+    ottenute = rollup.tabella()
+    assert rollup.n == CAPACITA_INIZIALE + 10
+    np.testing.assert_array_equal(ottenute.index.to_numpy(), attese.index.to_numpy())
+    np.testing.assert_allclose(ottenute[attese.columns].to_numpy(), attese.to_numpy())
+    np.testing.assert_allclose(ottenute['kpi_efficiency_rate'].to_numpy(),
+                               (attese['registered'] / attese['cnt'] * 100).to_numpy())
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from core.panel import Panel, kpi_giornalieri, riepilogo_serie
+
+
+def _panel_df(n=48, seed=0):
+    rng = np.random.default_rng(seed)
+    parti = []
+    for stazione in ('A', 'B'):
+        parti.append(pd.DataFrame({
+            'datetime': pd.date_range('2012-01-01', periods=n, freq='h'),
+            'station_id': stazione,
+            'registered': rng.integers(1, 100, n),
+            'cnt': rng.integers(100, 200, n),
+        }))
+    return pd.concat(parti, ignore_index=True)
+
+
+def test_righe_senza_id_escluse():
+    df = _panel_df()
+    df.loc[[3, 50, 70], 'station_id'] = np.nan
+    panel = Panel(df, 'station_id')
+
+    assert panel.righe_senza_id == 3
+    assert len(panel) == len(df) - 3
+    assert list(panel.ids) == ['A', 'B']
+    riepilogo = riepilogo_serie(panel)
+    assert riepilogo['righe'].tolist() == [47, 46]
+    assert riepilogo['cnt_totale'].sum() == df.dropna(subset=['station_id'])['cnt'].sum()
+
+
+def test_kpi_giornalieri_senza_registered():
+    df = _panel_df().drop(columns='registered')
+    panel = Panel(df, 'station_id')
+
+    tab = kpi_giornalieri(panel)
+    assert len(tab) == 4
+    assert tab['kpi_efficiency_rate'].isna().all()
+    assert tab['cnt'].sum() == df['cnt'].sum()
+    assert 'efficienza' not in riepilogo_serie(panel).columns
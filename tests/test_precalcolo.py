@@ -0,0 +1,65 @@
+import pandas as pd
+
+from core.precalcolo import PrecalcoloDataset, avvia_analisi
+
+
+def _attendi(precalcolo, chiave, nome):
+    try:
+        precalcolo.risultato(chiave, nome)
+    except Exception:
+        pass
+
+
+def test_fase_fallita_ritentata_solo_su_richiesta():
+    precalcolo = PrecalcoloDataset(max_workers=1)
+    tentativi = []
+
+    def fase():
+        tentativi.append(1)
+        if len(tentativi) == 1:
+            raise ValueError("primo tentativo")
+        return 42
+
+    precalcolo.avvia('a', 'fase', fase)
+    _attendi(precalcolo, 'a', 'fase')
+    assert not precalcolo.pronto('a', 'fase')
+    assert isinstance(precalcolo.errore('a', 'fase'), ValueError)
+    assert precalcolo.stato('a')['stato'].tolist() == ['errore']
+
+    # Un nuovo avvio (es. un rerun della pagina) non ripete la fase fallita
+    precalcolo.avvia('a', 'fase', fase)
+    assert len(tentativi) == 1
+    assert precalcolo.errore('a', 'fase') is not None
+
+    assert precalcolo.ritenta('a') == ['fase']
+    precalcolo.avvia('a', 'fase', fase)
+    _attendi(precalcolo, 'a', 'fase')
+    assert precalcolo.pronto('a', 'fase')
+    assert precalcolo.risultato('a', 'fase') == 42
+    assert precalcolo.ritenta('a') == []
+
+
+def test_eviction_rimuove_le_durate():
+    precalcolo = PrecalcoloDataset(max_workers=1, max_dataset=2)
+    for chiave in ('a', 'b', 'c'):
+        precalcolo.avvia(chiave, 'fase', int)
+        _attendi(precalcolo, chiave, 'fase')
+    assert {chiave for chiave, _ in precalcolo._secondi} == {'b', 'c'}
+
+
+def test_analisi_senza_colonna_data():
+    df = pd.DataFrame({
+        'station': ['nord', 'sud'] * 50,
+        'hr': list(range(24)) * 4 + [0, 1, 2, 3],
+        'registered': 1,
+        'cnt': 2,
+    })
+    precalcolo = PrecalcoloDataset(max_workers=1)
+    avvia_analisi('x', df, precalcolo)
+    for nome in ('cubo', 'correlazioni'):
+        _attendi(precalcolo, 'x', nome)
+
+    # Il rollup richiede l'indice temporale, le correlazioni no
+    assert isinstance(precalcolo.errore('x', 'cubo'), ValueError)
+    assert precalcolo.pronto('x', 'correlazioni')
+    assert ('hr', 'Tutti i dati') in precalcolo.risultato('x', 'correlazioni')
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+from core.rendering import indici_lttb, statistiche_box
+
+
+def test_lttb_un_punto_per_bucket_e_picchi_conservati():
+    n, n_out = 1000, 50
+    x = pd.date_range('2011-01-01', periods=n, freq='h').to_numpy()
+    y = np.sin(np.arange(n) / 30)
+    y[437] = 25.0
+
+    idx = indici_lttb(x, y, n_out)
+
+    assert len(idx) == n_out
+    assert idx[0] == 0 and idx[-1] == n - 1
+    # Un indice per bucket, quindi strettamente crescenti
+    bordi = np.linspace(1, n - 1, n_out - 1).astype(int)
+    assert ((idx[1:-1] >= bordi[:-1]) & (idx[1:-1] < bordi[1:])).all()
+    assert 437 in idx
+    np.testing.assert_array_equal(indici_lttb(x[:30], y[:30], n_out), np.arange(30))
+
+
+def _box_plotly(valori):
+    # Quartili 'linear' (default di Plotly) e baffi sul dato più estremo entro 1.5 IQR
+    q1, mediana, q3 = np.percentile(valori, [25, 50, 75])
+    iqr = q3 - q1
+    dentro = valori[(valori >= q1 - 1.5 * iqr) & (valori <= q3 + 1.5 * iqr)]
+    return q1, mediana, q3, dentro.min(), dentro.max()
+
+
+def test_statistiche_box_come_plotly():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({'ora': rng.integers(0, 4, 500), 'cnt': rng.normal(100, 20, 500)})
+    # Outlier in entrambe le direzioni: devono restare fuori dai baffi
+    df.loc[[0, 1, 2], 'cnt'] = [1000.0, -500.0, 900.0]
+
+    stats = statistiche_box(df, 'ora', 'cnt')
+
+    for ora, gruppo in df.groupby('ora'):
+        attese = _box_plotly(gruppo['cnt'].to_numpy())
+        ottenute = stats.loc[ora, ['q1', 'median', 'q3', 'lowerfence', 'upperfence']].to_numpy()
+        np.testing.assert_allclose(ottenute, attese)
+        assert stats.loc[ora, 'count'] == len(gruppo)
@@ -0,0 +1,61 @@
+import io
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.streaming import AccumulatoreStreaming, accumula_csv
+from core.weather import COLONNE_METEO
+
+
+def _attesa(df):
+    meteo = np.array(COLONNE_METEO)[df[COLONNE_METEO].to_numpy().argmax(axis=1)]
+    return df.groupby([df['datetime'].dt.year.to_numpy(), meteo]).agg(cnt=('cnt', 'mean'), n=('cnt', 'size'))
+
+
+def test_tabella_meteo_ripetibile_e_aggiornata_dopo_append(dati):
+    primo, secondo = dati(120), dati(211, inizio='2011-01-06', seed=1)
+    acc = AccumulatoreStreaming()
+    acc.aggiorna(primo)
+    acc.aggiorna(primo.iloc[:0])
+
+    prima = acc.tabella_meteo()
+    # Una seconda lettura non deve consumare lo stato dell'accumulatore
+    pd.testing.assert_frame_equal(acc.tabella_meteo(), prima)
+    assert prima['n'].sum() == len(primo)
+
+    acc.aggiorna(secondo)
+    dopo = acc.tabella_meteo()
+    tutti = pd.concat([primo, secondo], ignore_index=True)
+    assert dopo['n'].sum() == len(tutti)
+
+    attesa = _attesa(tutti)
+    ottenuta = dopo.set_index(['Year', 'Meteo_Label'])
+    np.testing.assert_array_equal(ottenuta['n'].to_numpy(), attesa['n'].to_numpy())
+    np.testing.assert_allclose(ottenuta['cnt'].to_numpy(), attesa['cnt'].to_numpy())
+
+
+def test_csv_grezzo_letto_con_il_timestamp_orario():
+    n = 50
+    grezzo = pd.DataFrame({
+        'instant': np.arange(1, n + 1),
+        'dteday': np.repeat(['2011-01-01', '2011-01-02', '2011-01-03'], 24)[:n],
+        'hr': np.tile(np.arange(24), 3)[:n],
+        'weathersit': 1,
+        'registered': 3,
+        'casual': 1,
+        'cnt': 4,
+    })
+    csv = grezzo.to_csv(index=False)
+    acc = accumula_csv(io.StringIO(csv), righe_per_chunk=20)
+
+    orarie = acc.somme_orarie()
+    assert acc.col_data == 'datetime'
+    assert orarie.index[0] == pd.Timestamp('2011-01-01 00:00')
+    assert orarie.index[-1] == pd.Timestamp('2011-01-03 01:00')
+    assert acc.tabella_meteo()['n'].sum() == n
+
+    # Senza data in prima colonna il file viene rifiutato invece di leggere
+    # il contatore come epoch 1970
+    with pytest.raises(ValueError):
+        accumula_csv(io.StringIO(grezzo.drop(columns=['dteday']).to_csv(index=False)))